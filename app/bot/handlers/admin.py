@@ -49,13 +49,19 @@ async def show_admin_stats(callback: CallbackQuery):
         f"├ Total: {stats['total_files']}\n"
         f"├ Created (24h): {stats['files_24h']}\n"
         f"├ Deleted: {stats['deleted_files']}\n"
-        f"└ Storage: {stats['storage_human']}\n\n"
+        f"├ Storage: {stats['storage_human']}\n"
+        f"└ Physical: {stats['physical_storage_human']}\n\n"
         f"🔥 <b>Top Files</b>\n"
     )
     
     for i, file in enumerate(stats['top_files'][:5], 1):
         text += f"{i}. {file['file_name'][:20]} - {file['downloads']} downloads\n"
     
+    if stats.get('top_files_24h'):
+        text += "\n⚡ <b>Trending (24h)</b>\n"
+        for i, file in enumerate(stats['top_files_24h'][:5], 1):
+            text += f"{i}. {file['file_name'][:20]} - {file['downloads']} downloads\n"
+    
     await callback.message.edit_text(text)
     await callback.answer()
 
@@ -0,0 +1,119 @@
+from aiogram import Router, F, Bot
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.filters import Command
+from app.services.files import get_file_by_uuid
+from app.services.bundles import (
+    get_bundle_draft, add_to_bundle_draft, remove_from_bundle_draft, clear_bundle_draft,
+    create_bundle_from_draft, get_bundle_files, bundle_payload, bundle_link
+)
+from app.services.qr import send_qr_photo
+from app.bot.keyboards.myfiles import get_bundle_draft_keyboard
+from app.config import settings
+import logging
+
+router = Router()
+logger = logging.getLogger(__name__)
+
+
+async def render_bundle_draft(user_id: int):
+    """Text and keyboard for the bundle being built"""
+    draft = await get_bundle_draft(user_id)
+    files = await get_bundle_files({"file_uuids": draft}) if draft else []
+
+    if not files:
+        text = (
+            "📦 <b>Bundle</b>\n\n"
+            "Your bundle is empty.\n"
+            "Open a file in /myfiles and tap <b>📦 Add to bundle</b>."
+        )
+        return text, get_bundle_draft_keyboard(False)
+
+    text = f"📦 <b>Bundle</b> ({len(files)}/{settings.BUNDLE_MAX_FILES} files)\n\n"
+    for i, file_doc in enumerate(files, 1):
+        text += f"{i}. {(file_doc.get('file_name') or 'Unnamed')[:40]}\n"
+    text += "\nFiles are delivered in this order."
+    return text, get_bundle_draft_keyboard(True)
+
+
+@router.message(Command("bundle"))
+async def cmd_bundle(message: Message):
+    """Handle /bundle command"""
+    text, keyboard = await render_bundle_draft(message.from_user.id)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data == "bundle:view")
+async def view_bundle_draft(callback: CallbackQuery):
+    """Show the bundle being built"""
+    text, keyboard = await render_bundle_draft(callback.from_user.id)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("bundle:toggle:"))
+async def toggle_bundle_file(callback: CallbackQuery):
+    """Add a file to the bundle, or remove it if already there"""
+    uuid = callback.data.split(":")[2]
+    user_id = callback.from_user.id
+
+    file_doc = await get_file_by_uuid(uuid)
+    if not file_doc or file_doc.get("deleted_at") or file_doc["owner_id"] != user_id:
+        await callback.answer("❌ File not found", show_alert=True)
+        return
+
+    if uuid in await get_bundle_draft(user_id):
+        count = await remove_from_bundle_draft(user_id, uuid)
+        await callback.answer(f"➖ Removed from bundle ({count} files)")
+        return
+
+    count = await add_to_bundle_draft(user_id, uuid)
+    if count is None:
+        await callback.answer(f"❌ A bundle holds at most {settings.BUNDLE_MAX_FILES} files", show_alert=True)
+        return
+    await callback.answer(f"➕ Added to bundle ({count} files) - /bundle to share")
+
+
+@router.callback_query(F.data == "bundle:clear")
+async def clear_bundle(callback: CallbackQuery):
+    """Empty the bundle being built"""
+    await clear_bundle_draft(callback.from_user.id)
+    text, keyboard = await render_bundle_draft(callback.from_user.id)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer("🗑 Bundle cleared")
+
+
+@router.callback_query(F.data == "bundle:create")
+async def create_bundle_link(callback: CallbackQuery, bot: Bot):
+    """Create a bundle link from the draft"""
+    bundle = await create_bundle_from_draft(callback.from_user.id)
+    if not bundle:
+        await callback.answer("❌ Your bundle has no files left", show_alert=True)
+        return
+
+    payload = bundle_payload(bundle["uuid"])
+    deep_link = bundle_link(bundle["uuid"])
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔗 Share Files", url=deep_link)]
+    ])
+    await callback.message.edit_text(
+        f"✅ <b>Bundle of {len(bundle['file_uuids'])} files created!</b>🔐\n\n"
+        f"<b>Link :</b> <a href='{deep_link}'>{deep_link}</a>\n\n"
+        f"<b>BUNDLE_UUID:</b> <code>{bundle['uuid']}</code>",
+        reply_markup=keyboard
+    )
+    await callback.answer()
+
+    try:
+        await send_qr_photo(
+            bot,
+            callback.message.chat.id,
+            payload,
+            caption="",  # No caption on QR
+            has_spoiler=True,
+            disable_notification=True
+        )
+    except Exception as e:
+        logger.error(f"❌ Error sending QR for bundle {bundle['uuid']}: {e}")
+
+    logger.info(f"✅ Bundle {bundle['uuid']} created from draft by user {callback.from_user.id}")
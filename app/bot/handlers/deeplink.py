@@ -1,13 +1,17 @@
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart, Command
-from app.services.files import get_file_by_uuid, increment_downloads
-from app.services.users import is_user_banned
+from app.services.files import get_cached_file, increment_downloads
+from app.services.users import is_user_banned_cached
+from app.services.downloads import get_download_count
+from app.services.leaderboard import record_serve
 from app.services.audits import log_audit
-from app.services.qr import generate_qr_code
+from app.services.qr import send_qr_photo
+from app.services.bundles import BUNDLE_PREFIX, bundle_cache, get_bundle_files, storage_copy_batches
 from app.bot.keyboards.main_menu import get_file_actions_keyboard
 from app.config import settings
 from app.utils.helpers import humanize_bytes
+import asyncio
 import logging
 
 router = Router()
@@ -27,10 +31,15 @@ async def handle_deep_link(message: Message, bot: Bot):
             return
         
         uuid = args[1].strip()
+        
+        if uuid.startswith(BUNDLE_PREFIX):
+            await serve_bundle(message, bot, uuid[len(BUNDLE_PREFIX):])
+            return
+        
         logger.info(f"Processing deep link request for UUID: {uuid}")
         
         # Find file
-        file_doc = await get_file_by_uuid(uuid)
+        file_doc = await get_cached_file(uuid)
         
         if not file_doc:
             logger.warning(f"File not found: {uuid}")
@@ -46,7 +55,7 @@ async def handle_deep_link(message: Message, bot: Bot):
             return
         
         # Check if owner is banned
-        if await is_user_banned(file_doc["owner_id"]):
+        if await is_user_banned_cached(file_doc["owner_id"]):
             logger.warning(f"File owner is banned: {file_doc['owner_id']}")
             await message.answer("❌ This file is no longer available")
             return
@@ -58,7 +67,8 @@ async def handle_deep_link(message: Message, bot: Bot):
             # Prepare caption
             file_name = file_doc.get('file_name', 'File')
             file_size = humanize_bytes(file_doc['size_bytes'])
-            caption_text = f"📁 <b>{file_name}</b>\n💾 Size: {file_size}\n📥 Downloads: {file_doc['downloads']}"
+            downloads = await get_download_count(file_doc)
+            caption_text = f"📁 <b>{file_name}</b>\n💾 Size: {file_size}\n📥 Downloads: {downloads}"
             
             # Copy the message
             copied_message = await bot.copy_message(
@@ -73,6 +83,7 @@ async def handle_deep_link(message: Message, bot: Bot):
             
             # Increment downloads
             await increment_downloads(uuid)
+            await record_serve(uuid)
             
             # Log audit
             await log_audit(message.from_user.id, "FILE_SERVED", uuid)
@@ -106,6 +117,57 @@ async def handle_deep_link(message: Message, bot: Bot):
         )
 
 
+async def serve_bundle(message: Message, bot: Bot, bundle_uuid: str):
+    """Deliver every live file of a bundle with batched copy_messages calls"""
+    logger.info(f"Processing deep link request for bundle: {bundle_uuid}")
+    
+    bundle = await bundle_cache.get(bundle_uuid)
+    if not bundle:
+        await message.answer("❌ Bundle not found")
+        return
+    
+    # Bundle members all belong to the bundle owner
+    if await is_user_banned_cached(bundle["owner_id"]):
+        await message.answer("❌ These files are no longer available")
+        return
+    
+    files = await get_bundle_files(bundle)
+    if not files:
+        await message.answer("❌ These files have been deleted")
+        return
+    
+    try:
+        for batch in storage_copy_batches([f["storage_channel_message_id"] for f in files]):
+            await bot.copy_messages(
+                chat_id=message.chat.id,
+                from_chat_id=settings.STORAGE_CHANNEL_ID,
+                message_ids=batch,
+                remove_caption=True
+            )
+    except Exception as copy_error:
+        logger.error(f"Error copying bundle {bundle_uuid} from storage channel: {copy_error}", exc_info=True)
+        await message.answer(
+            "❌ <b>Error retrieving files</b>\n\n"
+            "Please try again or contact the file owner.",
+            parse_mode="HTML"
+        )
+        return
+    
+    await asyncio.gather(
+        *[increment_downloads(f["uuid"]) for f in files],
+        *[record_serve(f["uuid"]) for f in files]
+    )
+    await log_audit(message.from_user.id, "BUNDLE_SERVED", bundle_uuid)
+    
+    text = f"✅ <b>{len(files)} files retrieved successfully!</b>"
+    missing = len(bundle["file_uuids"]) - len(files)
+    if missing:
+        text += f"\n\n⚠️ {missing} file(s) in this bundle have been deleted"
+    await message.answer(text, parse_mode="HTML")
+    
+    logger.info(f"Bundle {bundle_uuid} delivered to user {message.from_user.id}")
+
+
 @router.callback_query(F.data.startswith("file:qr:"))
 async def send_qr_again(callback: CallbackQuery, bot: Bot):
     """Send QR code with spoiler"""
@@ -113,11 +175,10 @@ async def send_qr_again(callback: CallbackQuery, bot: Bot):
         uuid = callback.data.split(":")[2]
         logger.info(f"Generating QR code for {uuid}")
         
-        qr_file = await generate_qr_code(uuid)
-        
-        await bot.send_photo(
-            chat_id=callback.message.chat.id,
-            photo=qr_file,
+        await send_qr_photo(
+            bot,
+            callback.message.chat.id,
+            uuid,
             caption="📱 <b>Scan this QR code to access the file</b>\n<i>(tap to reveal)</i>",
             has_spoiler=True,
             parse_mode="HTML"
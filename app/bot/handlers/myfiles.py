@@ -1,7 +1,9 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
-from app.services.files import get_user_files, count_user_files, soft_delete_file, get_file_by_uuid
+from app.services.files import get_user_files, soft_delete_file, get_file_by_uuid
+from app.services.users import get_user_usage
+from app.services.downloads import get_download_count
 from app.bot.keyboards.myfiles import get_myfiles_keyboard, get_file_detail_keyboard
 from app.config import settings
 from app.utils.helpers import humanize_bytes
@@ -17,13 +19,14 @@ PAGE_SIZE = 10
 @router.message(Command("myfiles"))
 async def cmd_myfiles(message: Message):
     """Handle /myfiles command"""
-    await show_myfiles_page(message, message.from_user.id, 1)
+    await show_myfiles_page(message, message.from_user.id)
 
 
-async def show_myfiles_page(message: Message, user_id: int, page: int):
-    """Show paginated files list"""
-    files = await get_user_files(user_id, page, PAGE_SIZE)
-    total_files = await count_user_files(user_id)
+async def show_myfiles_page(message: Message, user_id: int):
+    """Show first page of files list"""
+    page = 1
+    files = await get_user_files(user_id, page_size=PAGE_SIZE)
+    total_files, _ = await get_user_usage(user_id)
     total_pages = math.ceil(total_files / PAGE_SIZE) if total_files > 0 else 1
     
     if not files:
@@ -46,11 +49,29 @@ async def show_myfiles_page(message: Message, user_id: int, page: int):
 
 @router.callback_query(F.data.startswith("myfiles:page:"))
 async def myfiles_pagination(callback: CallbackQuery):
-    """Handle pagination"""
-    page = int(callback.data.split(":")[2])
+    """Handle pagination.
+
+    Callback data is myfiles:page:<page>[:<n|p>:<cursor>]; the page number
+    is only for display, the cursor positions the query.
+    """
+    parts = callback.data.split(":")
+    page = int(parts[2])
+    direction, cursor = (parts[3], parts[4]) if len(parts) == 5 else ("n", None)
+    
+    try:
+        files = await get_user_files(
+            callback.from_user.id,
+            cursor=cursor,
+            page_size=PAGE_SIZE,
+            before=direction == "p"
+        )
+    except ValueError:
+        await callback.answer("❌ Invalid page", show_alert=True)
+        return
     
-    files = await get_user_files(callback.from_user.id, page, PAGE_SIZE)
-    total_files = await count_user_files(callback.from_user.id)
+    if not cursor:
+        page = 1
+    total_files, _ = await get_user_usage(callback.from_user.id)
     total_pages = math.ceil(total_files / PAGE_SIZE) if total_files > 0 else 1
     
     text = f"📂 <b>My Files</b> (Page {page}/{total_pages})\n\n"
@@ -76,12 +97,13 @@ async def view_file_detail(callback: CallbackQuery):
         return
     
     deep_link = f"https://t.me/{settings.BOT_USERNAME}?start={uuid}"
+    downloads = await get_download_count(file_doc)
     
     text = (
         f"📄 <b>{file_doc.get('file_name', 'Unnamed')}</b>\n\n"
         f"🔹 Type: {file_doc['type'].title()}\n"
         f"🔹 Size: {humanize_bytes(file_doc['size_bytes'])}\n"
-        f"🔹 Downloads: {file_doc['downloads']}\n"
+        f"🔹 Downloads: {downloads}\n"
         f"🔹 Created: {file_doc['created_at'].strftime('%Y-%m-%d %H:%M')}\n\n"
         f"🔗 Link:\n<code>{deep_link}</code>"
     )
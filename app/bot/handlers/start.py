@@ -38,6 +38,7 @@ async def cmd_help(message: Message):
         "2️⃣ Get a shareable link and QR code\n"
         "3️⃣ Share with anyone!\n\n"
         "📂 /myfiles - View your uploaded files\n"
+        "📦 /bundle - Share several files with one link\n"
         "❓ /help - Show this message"
     )
     
@@ -1,13 +1,33 @@
 from aiogram import Router, F, Bot
 from aiogram.types import Message, ContentType, InlineKeyboardMarkup, InlineKeyboardButton
-from app.services.files import create_file_record
-from app.services.qr import generate_qr_code
+from app.services.files import (
+    create_file_record, create_file_records, discard_file_records, get_storage_quota_bytes, QuotaExceededError
+)
+from app.services.users import get_user_usage
+from app.services.qr import get_qr_png, send_qr_photo
+from app.services.storage import acquire_storage_object, release_storage_reference
+from app.services.bundles import create_bundle, bundle_payload, bundle_link
+from app.services.albums import buffer_album_item, claim_album
+from app.services import cache
 from app.config import settings
+from typing import Dict, List, Set
+import asyncio
+import time
 import logging
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# media_group_id -> album messages buffered in-process (only without Redis),
+# when this worker last saw an item, and its pending flush
+_media_groups: Dict[str, List[Message]] = {}
+_media_group_seen: Dict[str, float] = {}
+_media_group_tasks: Dict[str, asyncio.Task] = {}
+
+# Every album flush still running, awaited on shutdown
+_album_tasks: Set[asyncio.Task] = set()
+_flush_now = asyncio.Event()
+
 
 @router.message(F.content_type.in_([
     ContentType.DOCUMENT,
@@ -22,6 +42,11 @@ async def handle_file_upload(message: Message, bot: Bot):
     """Handle file upload from user"""
     user_id = message.from_user.id
     
+    # Albums arrive as one message per item; collect them and store together
+    if message.media_group_id:
+        await _buffer_media_group(message, bot)
+        return
+    
     # Extract file metadata
     file_type, file_obj = extract_file_info(message)
     
@@ -37,73 +62,349 @@ async def handle_file_upload(message: Message, bot: Bot):
         await message.answer(f"❌ File too large. Max: {settings.MAX_FILE_SIZE_MB} MB")
         return
     
-    # Show processing message
-    status_msg = await message.answer("⏳ Processing your file...")
+    # Check storage quota against the materialized counters
+    quota = get_storage_quota_bytes()
+    if quota is not None:
+        _, used_bytes = await get_user_usage(user_id)
+        if used_bytes + file_size > quota:
+            await message.answer(f"❌ Storage quota exceeded. Limit: {settings.USER_STORAGE_QUOTA_MB} MB")
+            return
+    
+    # Show processing message while the copy is in flight
+    status_task = asyncio.ensure_future(message.answer("⏳ Processing your file..."))
+    copied = None
     
     try:
-        # Copy to storage channel
-        copied = await bot.copy_message(
-            chat_id=settings.STORAGE_CHANNEL_ID,
-            from_chat_id=message.chat.id,
-            message_id=message.message_id
-        )
+        # Reuse a live stored copy of the same content if there is one
+        storage_message_id = None
+        if settings.STORAGE_DEDUP:
+            storage_message_id = await acquire_storage_object(file_obj.file_unique_id)
+        reused_storage = storage_message_id is not None
+        
+        if not reused_storage:
+            # Copy to storage channel
+            copied = await bot.copy_message(
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                from_chat_id=message.chat.id,
+                message_id=message.message_id
+            )
+            storage_message_id = copied.message_id
         
         # Create file record
         file_doc = await create_file_record(
             owner_id=user_id,
             file_type=file_type,
-            storage_message_id=copied.message_id,
+            storage_message_id=storage_message_id,
             file_id=file_obj.file_id,
             file_unique_id=file_obj.file_unique_id,
             file_name=getattr(file_obj, 'file_name', None),
             mime_type=getattr(file_obj, 'mime_type', None),
             size_bytes=file_size,
             width=getattr(file_obj, 'width', None),
-            height=getattr(file_obj, 'height', None)
+            height=getattr(file_obj, 'height', None),
+            reused_storage=reused_storage
         )
+    except QuotaExceededError:
+        # Lost the race with a concurrent upload; drop the orphaned storage copy
+        # (a reused copy's reference was already released)
+        if copied:
+            await _discard_storage_copies(bot, [copied.message_id])
+        await _report_failure(message, status_task, f"❌ Storage quota exceeded. Limit: {settings.USER_STORAGE_QUOTA_MB} MB")
+        return
+    except Exception as e:
+        logger.error(f"❌ Error storing file: {e}", exc_info=True)
+        # No record was created, so nothing refers to the copy
+        if copied:
+            await _discard_storage_copies(bot, [copied.message_id])
+        await _report_failure(message, status_task, "❌ Error storing file. Please try again.")
+        return
+    
+    uuid = file_doc["uuid"]
+    deep_link = f"https://t.me/{settings.BOT_USERNAME}?start={uuid}"
+    
+    link_text = (
+        "✅ <b>Stored!</b>🔐\n\n"
+        f"<b>Link :</b> <a href='{deep_link}'>{deep_link}</a>\n\n"
+        f"<b>FILE_UUID:</b> <code>{uuid}</code>"
+    )
+    await _send_link_and_qr(message, bot, status_task, uuid, deep_link, link_text, "🔗 Share File")
+    
+    logger.info(f"✅ File {uuid} uploaded by user {user_id}")
+
+
+async def _buffer_media_group(message: Message, bot: Bot):
+    """Add an album item; the album is stored MEDIA_GROUP_WAIT after its last item.
+
+    Items are buffered in Redis, so an album whose parts reach different
+    workers is still stored once; without Redis they are kept in-process.
+    """
+    group_id = message.media_group_id
+    item = message.model_dump_json(exclude_none=True, by_alias=True).encode()
+    if not await buffer_album_item(group_id, item):
+        _media_groups.setdefault(group_id, []).append(message)
+    _media_group_seen[group_id] = time.monotonic()
+    
+    if group_id not in _media_group_tasks:
+        task = asyncio.create_task(_flush_media_group(group_id, bot))
+        _media_group_tasks[group_id] = task
+        _album_tasks.add(task)
+        task.add_done_callback(_album_tasks.discard)
+
+
+async def _album_delay(seconds: float):
+    """Sleep that ends early once pending albums are being flushed for shutdown"""
+    try:
+        await asyncio.wait_for(_flush_now.wait(), seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _flush_media_group(group_id: str, bot: Bot):
+    # Wait until this worker has seen no item for MEDIA_GROUP_WAIT
+    while not _flush_now.is_set():
+        remaining = _media_group_seen[group_id] + settings.MEDIA_GROUP_WAIT - time.monotonic()
+        if remaining <= 0:
+            break
+        await _album_delay(remaining)
+    
+    # Then until the shared group is quiet too, and claim it
+    raw_items: List[bytes] = []
+    if cache.redis_client:
+        try:
+            while True:
+                claimed = await claim_album(group_id, force=_flush_now.is_set())
+                if not isinstance(claimed, float):
+                    raw_items = claimed
+                    break
+                await _album_delay(claimed)
+        except Exception as e:
+            logger.error(f"❌ Error claiming album {group_id}: {e}")
+    
+    _media_group_tasks.pop(group_id, None)
+    _media_group_seen.pop(group_id, None)
+    messages = [Message.model_validate_json(raw, context={"bot": bot}) for raw in raw_items]
+    messages += _media_groups.pop(group_id, [])
+    if not messages:
+        # Another worker claimed the album
+        return
+    try:
+        await handle_album_upload(sorted(messages, key=lambda m: m.message_id), bot)
+    except Exception as e:
+        logger.error(f"❌ Error storing album {group_id}: {e}", exc_info=True)
+
+
+async def flush_media_groups():
+    """Store every album this worker is still buffering, without waiting (shutdown)"""
+    _flush_now.set()
+    if _album_tasks:
+        await asyncio.gather(*list(_album_tasks), return_exceptions=True)
+
+
+async def _copy_to_storage(bot: Bot, chat_id: int, message_ids: List[int]) -> List[int]:
+    """Copy messages to the storage channel in one call; returns the new ids in order"""
+    copied = await bot.copy_messages(
+        chat_id=settings.STORAGE_CHANNEL_ID,
+        from_chat_id=chat_id,
+        message_ids=message_ids
+    )
+    if len(copied) == len(message_ids):
+        return [c.message_id for c in copied]
+    
+    # Telegram skips messages it cannot copy, losing the mapping; copy one by one instead
+    if copied:
+        await bot.delete_messages(settings.STORAGE_CHANNEL_ID, [c.message_id for c in copied])
+    storage_ids = []
+    try:
+        for message_id in message_ids:
+            single = await bot.copy_message(
+                chat_id=settings.STORAGE_CHANNEL_ID,
+                from_chat_id=chat_id,
+                message_id=message_id
+            )
+            storage_ids.append(single.message_id)
+    except Exception:
+        # The caller never sees these ids, so its rollback cannot delete them
+        if storage_ids:
+            await _discard_storage_copies(bot, storage_ids)
+        raise
+    return storage_ids
+
+
+async def handle_album_upload(messages: List[Message], bot: Bot):
+    """Store an album with one copy_messages call and one insert_many, then
+    reply once with a bundle link and QR for the whole album"""
+    first = messages[0]
+    user_id = first.from_user.id
+    max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    
+    items = []
+    for message in messages:
+        file_type, file_obj = extract_file_info(message)
+        if file_obj and getattr(file_obj, 'file_size', 0) <= max_size:
+            items.append((message, file_type, file_obj))
+    skipped = len(messages) - len(items)
+    
+    if not items:
+        await first.answer(f"❌ Files too large. Max: {settings.MAX_FILE_SIZE_MB} MB")
+        return
+    
+    total_size = sum(getattr(file_obj, 'file_size', 0) for _, _, file_obj in items)
+    quota = get_storage_quota_bytes()
+    if quota is not None:
+        _, used_bytes = await get_user_usage(user_id)
+        if used_bytes + total_size > quota:
+            await first.answer(f"❌ Storage quota exceeded. Limit: {settings.USER_STORAGE_QUOTA_MB} MB")
+            return
+    
+    status_task = asyncio.ensure_future(first.answer(f"⏳ Processing {len(items)} files..."))
+    copied_ids: List[int] = []
+    acquired: List[int] = []
+    file_docs: List[dict] = []
+    
+    try:
+        # Reuse live stored copies of the same content
+        storage_ids = [None] * len(items)
+        if settings.STORAGE_DEDUP:
+            storage_ids = await asyncio.gather(*[
+                acquire_storage_object(file_obj.file_unique_id) for _, _, file_obj in items
+            ])
+        reused = [sid is not None for sid in storage_ids]
+        acquired = [
+            (sid, getattr(file_obj, 'file_size', 0))
+            for sid, (_, _, file_obj) in zip(storage_ids, items) if sid is not None
+        ]
         
-        uuid = file_doc["uuid"]
-        deep_link = f"https://t.me/{settings.BOT_USERNAME}?start={uuid}"
-        
-        # Delete processing message
-        await status_msg.delete()
+        to_copy = [message.message_id for (message, _, _), is_reused in zip(items, reused) if not is_reused]
+        if to_copy:
+            copied_ids = await _copy_to_storage(bot, first.chat.id, to_copy)
+            fresh = iter(copied_ids)
+            storage_ids = [sid if sid is not None else next(fresh) for sid in storage_ids]
         
-        # STEP 1: Send QR code FIRST (at top)
-        qr_file = await generate_qr_code(uuid)
-        await bot.send_photo(
-            chat_id=message.chat.id,
-            photo=qr_file,
+        records = [
+            {
+                "file_type": file_type,
+                "storage_message_id": storage_id,
+                "file_id": file_obj.file_id,
+                "file_unique_id": file_obj.file_unique_id,
+                "file_name": getattr(file_obj, 'file_name', None),
+                "mime_type": getattr(file_obj, 'mime_type', None),
+                "size_bytes": getattr(file_obj, 'file_size', 0),
+                "width": getattr(file_obj, 'width', None),
+                "height": getattr(file_obj, 'height', None),
+                "reused_storage": is_reused
+            }
+            for (_, file_type, file_obj), storage_id, is_reused in zip(items, storage_ids, reused)
+        ]
+        # From here on create_file_records owns the reused references
+        acquired = []
+        file_docs = await create_file_records(user_id, records)
+        bundle = await create_bundle(user_id, [doc["uuid"] for doc in file_docs], source="album")
+    except QuotaExceededError:
+        if copied_ids:
+            await _discard_storage_copies(bot, copied_ids)
+        await _report_failure(first, status_task, f"❌ Storage quota exceeded. Limit: {settings.USER_STORAGE_QUOTA_MB} MB")
+        return
+    except Exception as e:
+        logger.error(f"❌ Error storing album: {e}", exc_info=True)
+        orphaned = copied_ids
+        try:
+            for storage_id, size_bytes in acquired:
+                await release_storage_reference(storage_id, size_bytes)
+            if file_docs:
+                # The user gets no link, so the records must not stay behind;
+                # a fresh copy may meanwhile be shared by another upload
+                unreferenced = set(await discard_file_records(user_id, file_docs))
+                orphaned = [storage_id for storage_id in copied_ids if storage_id in unreferenced]
+        except Exception as rollback_error:
+            logger.error(f"❌ Error rolling back album: {rollback_error}", exc_info=True)
+            orphaned = []
+        if orphaned:
+            await _discard_storage_copies(bot, orphaned)
+        await _report_failure(first, status_task, "❌ Error storing files. Please try again.")
+        return
+    
+    payload = bundle_payload(bundle["uuid"])
+    deep_link = bundle_link(bundle["uuid"])
+    link_text = (
+        f"✅ <b>Stored {len(file_docs)} files!</b>🔐\n\n"
+        f"<b>Link :</b> <a href='{deep_link}'>{deep_link}</a>\n\n"
+        f"<b>BUNDLE_UUID:</b> <code>{bundle['uuid']}</code>"
+    )
+    if skipped:
+        link_text += f"\n\n⚠️ {skipped} file(s) skipped (max {settings.MAX_FILE_SIZE_MB} MB)"
+    await _send_link_and_qr(first, bot, status_task, payload, deep_link, link_text, "🔗 Share Files")
+    
+    logger.info(f"✅ Album of {len(file_docs)} files stored as bundle {bundle['uuid']} by user {user_id}")
+
+
+async def _send_link_and_qr(
+    message: Message,
+    bot: Bot,
+    status_task: asyncio.Future,
+    payload: str,
+    deep_link: str,
+    link_text: str,
+    button_text: str
+):
+    """Replace the processing message with the link, then send the QR for `payload`"""
+    # Render the QR while the link goes out
+    qr_task = asyncio.create_task(get_qr_png(payload))
+    
+    # Share button
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=button_text, url=deep_link)]
+    ])
+    
+    results = await asyncio.gather(
+        _delete_status(status_task),
+        asyncio.ensure_future(message.answer(link_text, reply_markup=keyboard, parse_mode="HTML")),
+        return_exceptions=True
+    )
+    if isinstance(results[1], Exception):
+        logger.error(f"❌ Error sending link for {payload}: {results[1]}")
+    
+    # QR follows the link; a failure here leaves the stored file and link intact
+    try:
+        await qr_task
+        await send_qr_photo(
+            bot,
+            message.chat.id,
+            payload,
             caption="",  # No caption on QR
             has_spoiler=True,
             disable_notification=True
         )
-        
-        # STEP 2: Send link and details BELOW QR
-        link_text = (
-            "✅ <b>Stored!</b>🔐\n\n"
-            f"<b>Link :</b> <a href='{deep_link}'>{deep_link}</a>\n\n"
-            f"<b>FILE_UUID:</b> <code>{uuid}</code>"
-        )
-        
-        # Share File button
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="🔗 Share File", url=deep_link)]
-        ])
-        
-        await message.answer(
-            link_text,
-            reply_markup=keyboard,
-            parse_mode="HTML"
-        )
-        
-        logger.info(f"✅ File {uuid} uploaded by user {user_id}")
-        
     except Exception as e:
-        logger.error(f"❌ Error storing file: {e}", exc_info=True)
-        try:
-            await status_msg.edit_text("❌ Error storing file. Please try again.")
-        except:
-            await message.answer("❌ Error storing file. Please try again.")
+        logger.error(f"❌ Error sending QR for {payload}: {e}")
+
+
+async def _discard_storage_copies(bot: Bot, message_ids: List[int]):
+    """Delete storage-channel copies no record refers to; failures are only logged"""
+    try:
+        if len(message_ids) == 1:
+            await bot.delete_message(settings.STORAGE_CHANNEL_ID, message_ids[0])
+        else:
+            await bot.delete_messages(settings.STORAGE_CHANNEL_ID, message_ids)
+    except Exception as e:
+        logger.error(f"❌ Could not delete orphaned storage copies {message_ids}: {e}")
+
+
+async def _delete_status(status_task: asyncio.Future):
+    """Delete the processing message once it has been sent"""
+    try:
+        status_msg = await status_task
+        await status_msg.delete()
+    except Exception as e:
+        logger.debug(f"Could not delete status message: {e}")
+
+
+async def _report_failure(message: Message, status_task: asyncio.Future, text: str):
+    """Turn the processing message into an error, or reply if that fails"""
+    try:
+        status_msg = await status_task
+        await status_msg.edit_text(text)
+    except:
+        await message.answer(text)
 
 
 def extract_file_info(message: Message):
@@ -1,6 +1,7 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from typing import List, Dict, Any
+from app.utils.pagination import encode_cursor
 
 
 def get_myfiles_keyboard(files: List[Dict[str, Any]], page: int, total_pages: int) -> InlineKeyboardMarkup:
@@ -15,17 +16,22 @@ def get_myfiles_keyboard(files: List[Dict[str, Any]], page: int, total_pages: in
             InlineKeyboardButton(text=f"📄 {name}", callback_data=f"file:view:{uuid}")
         )
     
-    # Pagination
+    # Pagination - Prev/Next carry a keyset cursor to the first/last file shown
     nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Prev", callback_data=f"myfiles:page:{page-1}"))
+    if page > 1 and files:
+        cursor = encode_cursor(files[0]['created_at'], files[0]['_id'])
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Prev", callback_data=f"myfiles:page:{page-1}:p:{cursor}"))
     
     nav_buttons.append(InlineKeyboardButton(text=f"{page}/{total_pages}", callback_data="myfiles:noop"))
     
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(text="Next ➡️", callback_data=f"myfiles:page:{page+1}"))
+    if page < total_pages and files:
+        cursor = encode_cursor(files[-1]['created_at'], files[-1]['_id'])
+        nav_buttons.append(InlineKeyboardButton(text="Next ➡️", callback_data=f"myfiles:page:{page+1}:n:{cursor}"))
     
     builder.row(*nav_buttons)
+    builder.row(
+        InlineKeyboardButton(text="📦 Bundle", callback_data="bundle:view")
+    )
     
     return builder.as_markup()
 
@@ -41,8 +47,27 @@ def get_file_detail_keyboard(uuid: str, deep_link: str) -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="📱 QR", callback_data=f"file:qr:{uuid}"),
         InlineKeyboardButton(text="🗑 Delete", callback_data=f"file:delete:{uuid}")
     )
+    builder.row(
+        InlineKeyboardButton(text="📦 Add to bundle", callback_data=f"bundle:toggle:{uuid}")
+    )
     builder.row(
         InlineKeyboardButton(text="« Back", callback_data="myfiles:page:1")
     )
     
     return builder.as_markup()
+
+
+def get_bundle_draft_keyboard(has_files: bool) -> InlineKeyboardMarkup:
+    """Get keyboard for the bundle being built"""
+    builder = InlineKeyboardBuilder()
+    
+    if has_files:
+        builder.row(
+            InlineKeyboardButton(text="✅ Create link", callback_data="bundle:create"),
+            InlineKeyboardButton(text="🗑 Clear", callback_data="bundle:clear")
+        )
+    builder.row(
+        InlineKeyboardButton(text="📂 My Files", callback_data="myfiles:page:1")
+    )
+    
+    return builder.as_markup()
@@ -1,53 +1,105 @@
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from app.config import settings
-from app.bot.handlers import start, deeplink, upload, myfiles, admin
+from app.db.mongo import get_database
+from app.bot.handlers import start, deeplink, upload, myfiles, bundles, admin
 from app.bot.middlewares.auth import AuthMiddleware
 from app.bot.middlewares.rate_limit import RateLimitMiddleware
 from app.bot.middlewares.logging_middleware import LoggingMiddleware
+from datetime import datetime
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+# meta document holding the version of the last applied webhook registration
+WEBHOOK_SPEC_ID = "webhook_spec"
+
 bot: Bot = None
 dp: Dispatcher = None
 
 
+def build_dispatcher() -> Dispatcher:
+    """Dispatcher with the bot's middlewares and routers (webhook and polling alike)"""
+    dispatcher = Dispatcher()
+    
+    # Register middlewares
+    dispatcher.message.middleware(LoggingMiddleware())
+    dispatcher.message.middleware(AuthMiddleware())
+    dispatcher.message.middleware(RateLimitMiddleware())
+    
+    # Register routers - ORDER MATTERS!
+    # Deep link MUST be before regular start handler
+    dispatcher.include_router(deeplink.router)  # First - handles /start with UUID
+    dispatcher.include_router(start.router)     # Second - handles /start without UUID
+    dispatcher.include_router(upload.router)
+    dispatcher.include_router(myfiles.router)
+    dispatcher.include_router(bundles.router)
+    dispatcher.include_router(admin.router)
+    return dispatcher
+
+
 async def setup_bot():
-    """Setup bot and webhook"""
+    """Setup bot and dispatcher"""
     global bot, dp
     
+    # A self-hosted or mock Bot API server instead of api.telegram.org
+    session = None
+    if settings.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+    
     bot = Bot(
         token=settings.BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    dp = Dispatcher()
-    
-    # Register middlewares
-    dp.message.middleware(LoggingMiddleware())
-    dp.message.middleware(AuthMiddleware())
-    dp.message.middleware(RateLimitMiddleware())
-    
-    # Register routers - ORDER MATTERS!
-    # Deep link MUST be before regular start handler
-    dp.include_router(deeplink.router)  # First - handles /start with UUID
-    dp.include_router(start.router)     # Second - handles /start without UUID
-    dp.include_router(upload.router)
-    dp.include_router(myfiles.router)
-    dp.include_router(admin.router)
-    
-    # Set webhook
-    webhook_url = f"{settings.WEBHOOK_BASE_URL}/webhook"
-    
+    dp = build_dispatcher()
+
+
+def webhook_url() -> str:
+    return f"{settings.WEBHOOK_BASE_URL}/webhook"
+
+
+def webhook_spec_version() -> str:
+    """Digest of the webhook registration; changes when the URL, secret or update types do"""
+    spec = "|".join([webhook_url(), settings.WEBHOOK_SECRET, ",".join(ALLOWED_UPDATES)])
+    return hashlib.sha1(spec.encode()).hexdigest()
+
+
+async def set_bot_webhook(force: bool = False):
+    """Register the webhook with Telegram.
+
+    Skipped when the registration version stored in `meta` matches and
+    Telegram still has the webhook (polling mode deletes it), unless
+    `force` is set. Pending updates are kept, so a redeploy loses none.
+    """
+    version = webhook_spec_version()
     try:
+        if not force:
+            stored = await get_database().meta.find_one({"_id": WEBHOOK_SPEC_ID})
+            if stored and stored.get("version") == version:
+                info = await bot.get_webhook_info()
+                if info.url == webhook_url():
+                    logger.info(f"Webhook up to date (spec {version[:8]}), skipping registration")
+                    return
+
         await bot.set_webhook(
-            url=webhook_url,
-            drop_pending_updates=True,
-            allowed_updates=["message", "callback_query"]
+            url=webhook_url(),
+            allowed_updates=ALLOWED_UPDATES,
+            secret_token=settings.WEBHOOK_SECRET or None
+        )
+        await get_database().meta.update_one(
+            {"_id": WEBHOOK_SPEC_ID},
+            {"$set": {"version": version, "updated_at": datetime.utcnow()}},
+            upsert=True
         )
-        logger.info(f"✅ Webhook set to {webhook_url}")
+        logger.info(f"✅ Webhook set to {webhook_url()} (spec {version[:8]})")
     except Exception as e:
         logger.error(f"❌ Failed to set webhook: {e}")
         raise
@@ -1,7 +1,7 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message
-from app.services.users import is_user_banned, upsert_user
+from app.services.users import touch_user
 from app.config import settings
 
 
@@ -17,8 +17,8 @@ class AuthMiddleware(BaseMiddleware):
         """Check if user is banned"""
         user = event.from_user
         
-        # Upsert user on every interaction
-        await upsert_user(
+        # Upsert user (debounced) and get the cached ban flag
+        is_banned = await touch_user(
             user.id,
             user.first_name,
             user.last_name,
@@ -31,7 +31,7 @@ class AuthMiddleware(BaseMiddleware):
             return
         
         # Check if banned
-        if await is_user_banned(user.id):
+        if is_banned:
             await event.answer("❌ You are banned from using this bot.")
             return
         
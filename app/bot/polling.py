@@ -0,0 +1,233 @@
+"""Long-polling runner for nodes without a public HTTPS endpoint.
+
+Uses the same dispatcher (routers and middlewares) as the webhook app:
+
+    python -m app.bot.polling
+
+Telegram serves getUpdates only while no webhook is set, so this deletes the
+webhook on start; run one poller per bot token and no webhook app beside it.
+"""
+from collections import deque
+from typing import Deque, List, Optional, Set
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Update
+from app.config import settings
+from app.db.mongo import connect_db, close_db, create_indexes, index_specs, index_spec_version
+from app.services.cache import init_redis, close_redis
+from app.services.tiered_cache import start_invalidation_listener, stop_invalidation_listener
+from app.services.downloads import start_download_flusher, stop_download_flusher
+from app.services.audits import start_audit_writer, stop_audit_writer
+from app.services.stats import start_stats_reconciler, stop_stats_reconciler
+from app.services.broadcast import start_broadcast_supervisor, stop_broadcasts
+from app.services.qr import shutdown_qr_executor
+from app.services.startup import run_once
+from app.bot.main import ALLOWED_UPDATES, setup_bot, get_bot, get_bot_dispatcher
+from app.bot.update_queue import start_update_workers, stop_update_workers, enqueue_update, get_update_queue_stats
+from app.bot.update_dedup import claim_update, release_update
+from app.bot.handlers.upload import flush_media_groups
+import asyncio
+import signal
+import uvloop
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between retries after getUpdates fails
+MAX_BACKOFF = 30.0
+
+# Poll interval while every update Telegram returns is already in progress
+REPOLL_INTERVAL = 0.5
+
+_stats = {
+    "polls": 0,
+    "duplicates": 0
+}
+
+
+async def _sleep(delay: float, stop: asyncio.Event):
+    """Sleep that ends early on shutdown"""
+    try:
+        await asyncio.wait_for(stop.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+
+
+class Watermark:
+    """Offset that confirms only a contiguous run of finished updates.
+
+    Updates are handled out of order across users, so the offset stops at
+    the oldest unfinished one; Telegram keeps (and redelivers) everything
+    from there on, and ids already in progress are skipped on redelivery.
+    """
+
+    def __init__(self):
+        self.offset: Optional[int] = None
+        self.progress = asyncio.Event()
+        self._received: Deque[int] = deque()
+        self._tracked: Set[int] = set()
+        self._done: Set[int] = set()
+
+    def seen(self, update_id: int) -> bool:
+        return update_id in self._tracked or (self.offset is not None and update_id < self.offset)
+
+    def add(self, update_id: int, done: bool = False):
+        self._received.append(update_id)
+        self._tracked.add(update_id)
+        if done:
+            self.finish(update_id)
+        else:
+            self._advance()
+
+    def finish(self, update_id: int):
+        self._done.add(update_id)
+        self._advance()
+        self.progress.set()
+
+    def unfinished(self) -> List[int]:
+        return [update_id for update_id in self._received if update_id not in self._done]
+
+    def _advance(self):
+        while self._received and self._received[0] in self._done:
+            update_id = self._received.popleft()
+            self._tracked.discard(update_id)
+            self._done.discard(update_id)
+            self.offset = update_id + 1
+        if self._received:
+            self.offset = self._received[0]
+
+
+async def dispatch_updates(updates: List[Update], mark: Watermark) -> bool:
+    """Queue the new updates of a getUpdates result; False if there were none.
+
+    Stops at an update the full queue sheds, so the offset stays below it
+    and Telegram delivers it again.
+    """
+    fresh = False
+    for update in updates:
+        if mark.seen(update.update_id):
+            continue
+        # Finished by an earlier run that stopped before confirming it
+        if not await claim_update(update.update_id):
+            _stats["duplicates"] += 1
+            mark.add(update.update_id, done=True)
+            continue
+        if not await enqueue_update(update, on_done=mark.finish):
+            await release_update(update.update_id)
+            break
+        mark.add(update.update_id)
+        fresh = True
+    return fresh
+
+
+async def poll_updates(dp: Dispatcher, bot: Bot, stop: asyncio.Event):
+    """Long-poll getUpdates until `stop` is set, then confirm the handled updates.
+
+    Updates go through the same per-user queue as the webhook, so polling
+    continues while slow handlers run. On shutdown queued updates get up to
+    POLLING_DRAIN_TIMEOUT seconds to finish.
+    """
+    mark = Watermark()
+    backoff = 1.0
+    start_update_workers(dp, bot)
+
+    while not stop.is_set():
+        mark.progress.clear()
+        poll = asyncio.ensure_future(bot.get_updates(
+            offset=mark.offset,
+            limit=settings.POLLING_LIMIT,
+            timeout=settings.POLLING_TIMEOUT,
+            allowed_updates=ALLOWED_UPDATES,
+            request_timeout=settings.POLLING_TIMEOUT + 10
+        ))
+        stop_wait = asyncio.ensure_future(stop.wait())
+        await asyncio.wait({poll, stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+        stop_wait.cancel()
+        if not poll.done():
+            poll.cancel()
+            await asyncio.gather(poll, return_exceptions=True)
+            break
+
+        try:
+            updates = poll.result()
+        except TelegramRetryAfter as e:
+            await _sleep(e.retry_after, stop)
+            continue
+        except Exception as e:
+            logger.error(f"getUpdates error: {e}, retrying in {backoff:.0f}s")
+            await _sleep(backoff, stop)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+            continue
+
+        backoff = 1.0
+        _stats["polls"] += 1
+        if updates and not await dispatch_updates(updates, mark):
+            # Telegram answers at once while unconfirmed updates are pending;
+            # wait for one to finish (or a short interval) before asking again
+            try:
+                await asyncio.wait_for(mark.progress.wait(), REPOLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    await stop_update_workers(settings.POLLING_DRAIN_TIMEOUT)
+    # Cancelled updates stay unconfirmed; let their redelivery be handled
+    for update_id in mark.unfinished():
+        await release_update(update_id)
+
+    # Updates below the offset are confirmed by the next getUpdates call
+    if mark.offset is not None:
+        try:
+            await bot.get_updates(offset=mark.offset, limit=1, timeout=0)
+        except Exception as e:
+            logger.error(f"Failed to confirm updates up to {mark.offset}: {e}")
+
+    queue_stats = get_update_queue_stats()
+    logger.info(
+        f"Polling stopped: {_stats['polls']} polls, {queue_stats['processed']} updates handled, "
+        f"{queue_stats['failed']} failed, {_stats['duplicates']} duplicates skipped"
+    )
+
+
+async def main():
+    logger.info("🚀 Starting bot in polling mode...")
+    await connect_db()
+    await init_redis()
+    await run_once(f"indexes:{index_spec_version(index_specs())[:12]}", create_indexes)
+    start_audit_writer()
+    start_invalidation_listener()
+    start_download_flusher()
+    start_stats_reconciler()
+    await setup_bot()
+    bot, dp = get_bot(), get_bot_dispatcher()
+    await bot.delete_webhook(drop_pending_updates=False)
+    start_broadcast_supervisor(bot)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("✅ Polling for updates")
+    try:
+        await poll_updates(dp, bot, stop)
+    finally:
+        logger.info("Shutting down...")
+        await flush_media_groups()
+        await stop_broadcasts()
+        await stop_stats_reconciler()
+        await stop_download_flusher()
+        await stop_invalidation_listener()
+        await stop_audit_writer()
+        shutdown_qr_executor()
+        await bot.session.close()
+        await close_redis()
+        await close_db()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    uvloop.install()
+    asyncio.run(main())
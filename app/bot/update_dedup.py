@@ -0,0 +1,53 @@
+from typing import Any, Dict
+from app.services import cache
+from app.services.tiered_cache import LocalLRU
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Recently seen update_ids in this process; also the fallback without Redis
+_seen = LocalLRU(settings.UPDATE_DEDUP_LOCAL_MAX_ITEMS, settings.UPDATE_DEDUP_TTL)
+
+_stats = {
+    "duplicates_dropped": 0,
+    "redis_errors": 0
+}
+
+
+def _key(update_id: int) -> str:
+    return f"update:seen:{update_id}"
+
+
+async def claim_update(update_id: int) -> bool:
+    """Mark an update as seen; False if it was seen before (a redelivery).
+
+    Redis SET NX makes the claim shared by every worker; the local set
+    answers repeats in this process without a round trip.
+    """
+    if _seen.get(update_id) is True:
+        _stats["duplicates_dropped"] += 1
+        return False
+    _seen.set(update_id, True)
+
+    if cache.redis_client:
+        try:
+            claimed = await cache.redis_client.set(_key(update_id), b"1", nx=True, ex=settings.UPDATE_DEDUP_TTL)
+            if not claimed:
+                _stats["duplicates_dropped"] += 1
+                return False
+        except Exception as e:
+            _stats["redis_errors"] += 1
+            logger.error(f"Update dedup Redis error: {e}")
+    return True
+
+
+async def release_update(update_id: int):
+    """Forget a claimed update that was not processed, so its redelivery is"""
+    _seen.delete(update_id)
+    await cache.cache_delete(_key(update_id))
+
+
+def get_update_dedup_stats() -> Dict[str, Any]:
+    """Dropped duplicates; a rising count means slow responses cause redelivery"""
+    return {**_stats, "local_seen": len(_seen)}
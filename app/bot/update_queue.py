@@ -0,0 +1,175 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from app.config import settings
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One chain per user with queued updates; a chain handles its updates in
+# order while chains of different users run side by side, up to
+# WEBHOOK_WORKERS handlers at once. A slow handler only holds up its own user.
+_chains: Dict[int, Deque[Tuple[Update, float, Optional[Callable[[int], None]]]]] = {}
+_chain_tasks: Set[asyncio.Task] = set()
+
+_dp: Optional[Dispatcher] = None
+_bot: Optional[Bot] = None
+_handlers: Optional[asyncio.Semaphore] = None  # concurrent handlers
+_slots: Optional[asyncio.Semaphore] = None     # free queue capacity
+_idle = asyncio.Event()
+_pending = 0
+
+# Recent queue wait times (seconds), for the stats endpoint
+_waits: deque = deque(maxlen=1000)
+
+_stats = {
+    "enqueued": 0,
+    "processed": 0,
+    "failed": 0,
+    "shed": 0,
+    "max_depth": 0
+}
+
+
+def update_order_key(update: Update) -> int:
+    """The user (or chat) whose updates must stay in order"""
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat:
+        return chat.id
+    return update.update_id
+
+
+def _finish_one():
+    global _pending
+    _pending -= 1
+    _slots.release()
+    if not _pending:
+        _idle.set()
+
+
+async def _run_chain(key: int, chain: Deque[Tuple[Update, float, Optional[Callable[[int], None]]]]):
+    try:
+        while chain:
+            update, enqueued_at, on_done = chain[0]
+            async with _handlers:
+                _waits.append(time.monotonic() - enqueued_at)
+                try:
+                    await _dp.feed_update(_bot, update)
+                    _stats["processed"] += 1
+                except Exception as e:
+                    _stats["failed"] += 1
+                    logger.error(f"Update {update.update_id} handler error: {e}", exc_info=True)
+            chain.popleft()
+            _finish_one()
+            if on_done:
+                on_done(update.update_id)
+    finally:
+        # No await since the last emptiness check, so nothing was appended
+        if _chains.get(key) is chain and not chain:
+            del _chains[key]
+
+
+def start_update_workers(dp: Dispatcher, bot: Bot):
+    """Start processing queued updates (behind the webhook or the poller)"""
+    global _dp, _bot, _handlers, _slots
+    if _dp:
+        return
+    _dp, _bot = dp, bot
+    _handlers = asyncio.Semaphore(settings.WEBHOOK_WORKERS)
+    _slots = asyncio.Semaphore(settings.WEBHOOK_QUEUE_SIZE)
+    _idle.set()
+    logger.info(f"Update queue started ({settings.WEBHOOK_WORKERS} concurrent handlers)")
+
+
+def update_workers_running() -> bool:
+    return _dp is not None
+
+
+async def enqueue_update(update: Update, on_done: Optional[Callable[[int], None]] = None) -> bool:
+    """Queue an update behind the same user's earlier ones.
+
+    `on_done(update_id)` is called once its handlers have finished (or
+    failed); not for updates still unfinished when the queue is stopped.
+
+    When WEBHOOK_QUEUE_SIZE updates are already queued the caller waits up
+    to WEBHOOK_ENQUEUE_TIMEOUT (backpressure on Telegram's delivery); after
+    that the update is shed and False is returned.
+    """
+    global _pending
+    if _slots.locked():
+        try:
+            await asyncio.wait_for(_slots.acquire(), settings.WEBHOOK_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            _stats["shed"] += 1
+            if _stats["shed"] % 100 == 1:
+                logger.warning(f"Update queue full, {_stats['shed']} updates shed so far")
+            return False
+    else:
+        await _slots.acquire()
+
+    _pending += 1
+    _idle.clear()
+    item = (update, time.monotonic(), on_done)
+    key = update_order_key(update)
+    chain = _chains.get(key)
+    if chain is not None:
+        chain.append(item)
+    else:
+        chain = _chains[key] = deque([item])
+        task = asyncio.create_task(_run_chain(key, chain))
+        _chain_tasks.add(task)
+        task.add_done_callback(_chain_tasks.discard)
+
+    _stats["enqueued"] += 1
+    _stats["max_depth"] = max(_stats["max_depth"], _pending)
+    return True
+
+
+def queue_depth() -> int:
+    """Updates queued or being handled"""
+    return _pending
+
+
+async def stop_update_workers(timeout: Optional[float] = 10.0):
+    """Finish queued updates (up to `timeout` seconds), then stop"""
+    global _dp, _bot, _pending
+    if not _dp:
+        return
+    try:
+        await asyncio.wait_for(_idle.wait(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Stopping update queue with {queue_depth()} updates unfinished")
+    for task in list(_chain_tasks):
+        task.cancel()
+    await asyncio.gather(*_chain_tasks, return_exceptions=True)
+    _chains.clear()
+    _pending = 0
+    _dp = _bot = None
+
+
+def get_update_queue_stats() -> Dict[str, Any]:
+    """Queue depth, throughput counters and recent wait times"""
+    waits = sorted(_waits)
+
+    def percentile(p: float) -> float:
+        if not waits:
+            return 0.0
+        return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 2)
+
+    return {
+        **_stats,
+        "workers": settings.WEBHOOK_WORKERS if _dp else 0,
+        "active_users": len(_chains),
+        "depth": queue_depth(),
+        "capacity": settings.WEBHOOK_QUEUE_SIZE,
+        "wait_ms_p50": percentile(0.5),
+        "wait_ms_p95": percentile(0.95),
+        "wait_ms_max": round(waits[-1] * 1000, 2) if waits else 0.0
+    }
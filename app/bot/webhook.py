@@ -0,0 +1,25 @@
+from typing import Optional
+from aiogram import Bot
+from aiogram.types import Update
+from app.config import settings
+import hmac
+import orjson
+
+# Header Telegram sets to the secret_token given to set_webhook
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def verify_secret_token(token: Optional[str]) -> bool:
+    """Check the webhook secret header; always passes when no secret is configured"""
+    if not settings.WEBHOOK_SECRET:
+        return True
+    return token is not None and hmac.compare_digest(token.encode(), settings.WEBHOOK_SECRET.encode())
+
+
+def decode_update(body: bytes, bot: Bot) -> Update:
+    """Parse a raw webhook body into an Update mounted on `bot`.
+
+    Validating with the bot in context means feed_update does not have to
+    re-create the whole Update to attach it.
+    """
+    return Update.model_validate(orjson.loads(body), context={"bot": bot})
@@ -9,7 +9,9 @@ class Settings(BaseSettings):
     STORAGE_CHANNEL_ID: int
     MONGODB_URI: str
     REDIS_URL: str = "redis://localhost:6379/0"
-    WEBHOOK_BASE_URL: str
+    WEBHOOK_BASE_URL: str = ""
+    TELEGRAM_API_URL: str = ""
+    WEBHOOK_SECRET: str = ""
     PORT: int = 8080
     ADMIN_IDS: str
     ADMIN_EMAIL: str
@@ -19,6 +21,43 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE_MB: int = 2000
     USER_RATE_LIMIT_PER_MIN: int = 20
     GLOBAL_RATE_LIMIT_RPS: int = 50
+    CACHE_LOCAL_MAX_ITEMS: int = 10000
+    CACHE_LOCAL_TTL: int = 30
+    CACHE_REDIS_TTL: int = 300
+    DOWNLOAD_FLUSH_INTERVAL: int = 5
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    USER_TOUCH_DEBOUNCE: int = 300
+    REDIS_RECONNECT_INTERVAL: int = 30
+    RATE_LIMIT_REDIS_RETRY: int = 5
+    LOCAL_RATE_LIMIT_SHARDS: int = 16
+    LOCAL_RATE_LIMIT_MAX_KEYS: int = 100000
+    USER_STORAGE_QUOTA_MB: int = 0
+    STORAGE_DEDUP: bool = True
+    MEDIA_GROUP_WAIT: float = 1.0
+    BUNDLE_MAX_FILES: int = 100
+    WEBHOOK_ASYNC: bool = True
+    WEBHOOK_WORKERS: int = 32
+    WEBHOOK_QUEUE_SIZE: int = 2000
+    WEBHOOK_ENQUEUE_TIMEOUT: float = 2.0
+    UPDATE_DEDUP_TTL: int = 3600
+    UPDATE_DEDUP_LOCAL_MAX_ITEMS: int = 50000
+    POLLING_LIMIT: int = 100
+    POLLING_TIMEOUT: int = 30
+    POLLING_DRAIN_TIMEOUT: float = 30.0
+    STARTUP_TASK_TTL: int = 300
+    STARTUP_LOCK_TTL: int = 60
+    STARTUP_WAIT_TIMEOUT: float = 90.0
+    STATS_RECONCILE_INTERVAL: int = 3600
+    BROADCAST_MESSAGES_PER_SECOND: int = 25
+    BROADCAST_CONCURRENCY: int = 10
+    BROADCAST_CHUNK_SIZE: int = 100
+    BROADCAST_MAX_RETRIES: int = 3
+    BROADCAST_LEASE_SECONDS: int = 120
+    QR_RENDER_EXECUTOR: str = "thread"
+    QR_RENDER_WORKERS: int = 4
+    QR_RENDER_MAX_PENDING: int = 64
 
     @property
     def admin_ids_list(self) -> List[int]:
@@ -1,10 +1,18 @@
+from datetime import datetime
+from typing import Dict, List
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import IndexModel, ASCENDING, DESCENDING
 from app.config import settings
+import asyncio
+import hashlib
+import bson
 import logging
 
 logger = logging.getLogger(__name__)
 
+# meta document holding the version of the last applied index specs
+INDEX_SPEC_ID = "index_spec"
+
 
 class Database:
     """Database connection manager"""
@@ -31,8 +39,6 @@ async def connect_db():
         # Test connection
         await db.client.admin.command('ping')
         logger.info("✅ Connected to MongoDB Atlas")
-        
-        await create_indexes()
     except Exception as e:
         logger.error(f"❌ MongoDB connection failed: {e}")
         raise
@@ -45,35 +51,87 @@ async def close_db():
         logger.info("Closed MongoDB connection")
 
 
-async def create_indexes():
-    """Create all required indexes for optimal performance"""
+def index_specs() -> Dict[str, List[IndexModel]]:
+    """Required indexes per collection"""
+    # Users collection indexes
+    users_indexes = [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("last_seen_at", DESCENDING)]),
+        IndexModel([("is_banned", ASCENDING)])
+    ]
+    
+    # Files collection indexes
+    files_indexes = [
+        IndexModel([("uuid", ASCENDING)], unique=True),
+        IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("file_unique_id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("deleted_at", ASCENDING), ("size_bytes", ASCENDING)])
+    ]
+    
+    # Audits collection indexes
+    audits_indexes = [
+        IndexModel([("at", DESCENDING)]),
+        IndexModel([("actor_id", ASCENDING), ("at", DESCENDING)])
+    ]
+
+    # Stats collection: hourly buckets expire after 8 days
+    stats_indexes = [
+        IndexModel([("at", ASCENDING)], expireAfterSeconds=8 * 86400)
+    ]
+
+    # Storage objects: dedup lookup of live copies by content
+    storage_objects_indexes = [
+        IndexModel([("file_unique_id", ASCENDING), ("refs", ASCENDING)])
+    ]
+
+    # Bundles collection indexes
+    bundles_indexes = [
+        IndexModel([("uuid", ASCENDING)], unique=True),
+        IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)])
+    ]
+
+    return {
+        "users": users_indexes,
+        "files": files_indexes,
+        "audits": audits_indexes,
+        "stats": stats_indexes,
+        "storage_objects": storage_objects_indexes,
+        "bundles": bundles_indexes
+    }
+
+
+def index_spec_version(specs: Dict[str, List[IndexModel]]) -> str:
+    """Digest of the index definitions; changes whenever one is added or altered"""
+    canonical = [[name, [model.document for model in models]] for name, models in specs.items()]
+    return hashlib.sha1(bson.encode({"specs": canonical})).hexdigest()
+
+
+async def create_indexes(force: bool = False):
+    """Create all required indexes for optimal performance.
+
+    Skipped when the index-spec version stored in `meta` matches the
+    current definitions, unless `force` is set.
+    """
     try:
-        # Users collection indexes
-        users_indexes = [
-            IndexModel([("user_id", ASCENDING)], unique=True),
-            IndexModel([("last_seen_at", DESCENDING)])
-        ]
+        specs = index_specs()
+        version = index_spec_version(specs)
         
-        # Files collection indexes
-        files_indexes = [
-            IndexModel([("uuid", ASCENDING)], unique=True),
-            IndexModel([("owner_id", ASCENDING), ("created_at", DESCENDING)]),
-            IndexModel([("file_unique_id", ASCENDING)]),
-            IndexModel([("created_at", DESCENDING)]),
-            IndexModel([("deleted_at", ASCENDING)])
-        ]
+        stored = await db.db.meta.find_one({"_id": INDEX_SPEC_ID})
+        if not force and stored and stored.get("version") == version:
+            logger.info(f"MongoDB indexes up to date (spec {version[:8]}), skipping creation")
+            return
         
-        # Audits collection indexes
-        audits_indexes = [
-            IndexModel([("at", DESCENDING)]),
-            IndexModel([("actor_id", ASCENDING), ("at", DESCENDING)])
-        ]
-
-        await db.db.users.create_indexes(users_indexes)
-        await db.db.files.create_indexes(files_indexes)
-        await db.db.audits.create_indexes(audits_indexes)
+        await asyncio.gather(*[
+            db.db[name].create_indexes(models) for name, models in specs.items()
+        ])
+        await db.db.meta.update_one(
+            {"_id": INDEX_SPEC_ID},
+            {"$set": {"version": version, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
         
-        logger.info("✅ MongoDB indexes created successfully")
+        logger.info(f"✅ MongoDB indexes created successfully (spec {version[:8]})")
     except Exception as e:
         logger.error(f"❌ Index creation error: {e}")
 
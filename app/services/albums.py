@@ -0,0 +1,66 @@
+from typing import List, Union
+from app.services import cache
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Album items outlive the debounce by this much before Redis drops them
+ALBUM_ITEMS_TTL = 60
+
+# Returns the ms until the album has been quiet for MEDIA_GROUP_WAIT, or
+# claims it: the items are returned and deleted in one step, so exactly
+# one worker stores each album. ARGV[1] = "1" claims without waiting.
+_CLAIM_SCRIPT = """
+if ARGV[1] ~= '1' then
+    local wait = redis.call('PTTL', KEYS[2])
+    if wait > 0 then
+        return wait
+    end
+end
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+return items
+"""
+
+
+def _items_key(group_id: str) -> str:
+    return f"album:{group_id}:items"
+
+
+def _quiet_key(group_id: str) -> str:
+    return f"album:{group_id}:quiet"
+
+
+async def buffer_album_item(group_id: str, item: bytes) -> bool:
+    """Add a serialized album message to the group shared by every worker.
+
+    Restarts the group's quiet period. False when Redis is unavailable and
+    the caller has to buffer locally.
+    """
+    if not cache.redis_client:
+        return False
+    try:
+        async with cache.redis_client.pipeline(transaction=True) as pipe:
+            pipe.rpush(_items_key(group_id), item)
+            pipe.expire(_items_key(group_id), ALBUM_ITEMS_TTL)
+            pipe.set(_quiet_key(group_id), b"1", px=int(settings.MEDIA_GROUP_WAIT * 1000))
+            await pipe.execute()
+        return True
+    except Exception as e:
+        logger.error(f"Album buffer error for {group_id}: {e}")
+        return False
+
+
+async def claim_album(group_id: str, force: bool = False) -> Union[List[bytes], float]:
+    """The group's items once it has been quiet for MEDIA_GROUP_WAIT, else the
+    seconds left to wait.
+
+    An empty list means another worker already claimed the album.
+    """
+    result = await cache.redis_client.eval(
+        _CLAIM_SCRIPT, 2, _items_key(group_id), _quiet_key(group_id), "1" if force else "0"
+    )
+    if isinstance(result, int):
+        return result / 1000
+    return result
@@ -1,6 +1,23 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict, Any, List
 from app.db.mongo import get_database
+from app.config import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+_inflight: Optional[asyncio.Future] = None
+_batch: List[Dict[str, Any]] = []
+
+_stats = {
+    "enqueued": 0,
+    "written": 0,
+    "dropped": 0,
+    "failed": 0
+}
 
 
 async def log_audit(
@@ -9,9 +26,7 @@ async def log_audit(
     target_uuid: Optional[str] = None,
     notes: Optional[str] = None
 ):
-    """Log audit event"""
-    db = get_database()
-    
+    """Log audit event (queued and written in batches when the pipeline runs)"""
     audit_doc = {
         "at": datetime.utcnow(),
         "actor_id": actor_id,
@@ -19,5 +34,103 @@ async def log_audit(
         "target_uuid": target_uuid,
         "notes": notes
     }
-    
-    await db.audits.insert_one(audit_doc)
+
+    if _queue is None:
+        db = get_database()
+        await db.audits.insert_one(audit_doc)
+        return
+
+    try:
+        _queue.put_nowait(audit_doc)
+        _stats["enqueued"] += 1
+    except asyncio.QueueFull:
+        _stats["dropped"] += 1
+        if _stats["dropped"] % 1000 == 1:
+            logger.warning(f"Audit queue full, {_stats['dropped']} events dropped so far")
+
+
+async def _write(batch: List[Dict[str, Any]]):
+    db = get_database()
+    try:
+        await db.audits.insert_many(batch, ordered=False)
+        _stats["written"] += len(batch)
+    except Exception as e:
+        _stats["failed"] += len(batch)
+        logger.error(f"Audit batch write error ({len(batch)} events): {e}")
+
+
+async def _writer():
+    """Drain the queue in size- or time-bounded batches"""
+    global _inflight
+    loop = asyncio.get_running_loop()
+
+    while True:
+        _batch.append(await _queue.get())
+        deadline = loop.time() + settings.AUDIT_FLUSH_INTERVAL
+
+        while len(_batch) < settings.AUDIT_BATCH_SIZE:
+            try:
+                _batch.append(_queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                _batch.append(await asyncio.wait_for(_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        batch = _batch[:]
+        _batch.clear()
+        # Shielded so cancelling the writer on shutdown never aborts a write
+        _inflight = asyncio.ensure_future(_write(batch))
+        await asyncio.shield(_inflight)
+        _inflight = None
+
+
+def start_audit_writer():
+    """Start the background audit writer"""
+    global _queue, _writer_task
+    if _writer_task:
+        return
+    _queue = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+    _writer_task = asyncio.create_task(_writer())
+    logger.info("✅ Audit writer started")
+
+
+async def stop_audit_writer():
+    """Stop the writer and flush every queued event"""
+    global _queue, _writer_task
+    if not _writer_task:
+        return
+
+    _writer_task.cancel()
+    try:
+        await _writer_task
+    except asyncio.CancelledError:
+        pass
+    _writer_task = None
+
+    if _inflight and not _inflight.done():
+        await _inflight
+
+    remaining = _batch[:]
+    _batch.clear()
+    while not _queue.empty():
+        remaining.append(_queue.get_nowait())
+    _queue = None
+
+    for i in range(0, len(remaining), settings.AUDIT_BATCH_SIZE):
+        await _write(remaining[i:i + settings.AUDIT_BATCH_SIZE])
+
+    logger.info(f"Audit writer stopped, flushed {len(remaining)} queued events")
+
+
+def get_audit_stats() -> Dict[str, int]:
+    """Audit pipeline counters"""
+    return {
+        **_stats,
+        "queued": _queue.qsize() if _queue else 0
+    }
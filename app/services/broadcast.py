@@ -0,0 +1,389 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+from bson import ObjectId
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+from pymongo import ReturnDocument
+from app.db.mongo import get_database
+from app.services import cache
+from app.services.rate_limit import acquire
+from app.config import settings
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process as the holder of a job lease
+WORKER_ID = uuid4().hex
+
+_tasks: Dict[str, asyncio.Task] = {}
+_supervisor_task: Optional[asyncio.Task] = None
+
+# RetryAfter pause shared by every worker's senders, next to the rate limit;
+# _paused_until is this worker's copy (and the only one without Redis)
+PAUSE_KEY = "ratelimit:broadcast:paused"
+_paused_until = 0.0
+
+
+async def create_broadcast(message: str, parse_mode: str = "HTML") -> str:
+    """Create a broadcast job record and return its id"""
+    db = get_database()
+    job = {
+        "message": message,
+        "parse_mode": parse_mode,
+        "status": "running",
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "updated_at": None,
+        "total": None,
+        "checkpoint": None,
+        "sent": 0,
+        "failed": 0,
+        "blocked": 0,
+        "rate_limited": 0,
+        "messages_per_second": 0.0,
+        "lease_owner": None,
+        "lease_until": None
+    }
+    result = await db.broadcasts.insert_one(job)
+    return str(result.inserted_id)
+
+
+async def _acquire_lease(job_id: ObjectId) -> Optional[Dict[str, Any]]:
+    """Claim a running job unless another live worker holds it"""
+    db = get_database()
+    now = datetime.utcnow()
+    return await db.broadcasts.find_one_and_update(
+        {
+            "_id": job_id,
+            "status": "running",
+            "$or": [
+                {"lease_until": None},
+                {"lease_until": {"$lt": now}},
+                {"lease_owner": WORKER_ID}
+            ]
+        },
+        {"$set": {
+            "lease_owner": WORKER_ID,
+            "lease_until": now + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS)
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _heartbeat(job_id: ObjectId, lost: asyncio.Event):
+    """Renew the lease while a chunk is sending; set `lost` once it cannot be kept.
+
+    A RetryAfter pause or a busy shared budget can make one chunk outlast
+    the lease, and another worker would then resume the job alongside us.
+    """
+    db = get_database()
+    lease = settings.BROADCAST_LEASE_SECONDS
+    interval = lease / 3
+    expires = time.monotonic() + lease
+    while True:
+        try:
+            result = await db.broadcasts.update_one(
+                {"_id": job_id, "lease_owner": WORKER_ID},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=lease)}}
+            )
+            if not result.matched_count:
+                lost.set()
+                return
+            expires = time.monotonic() + lease
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} lease renewal error: {e}")
+            # Stop before the lease can run out under another worker
+            if time.monotonic() + interval >= expires:
+                lost.set()
+                return
+        await asyncio.sleep(interval)
+
+
+async def _pause_sending(seconds: float):
+    """Stop every worker's broadcast sends for `seconds` (Telegram flood control)"""
+    global _paused_until
+    _paused_until = max(_paused_until, time.monotonic() + seconds)
+    if not cache.redis_client:
+        return
+    try:
+        remaining_ms = await cache.redis_client.pttl(PAUSE_KEY)
+        if remaining_ms < seconds * 1000:
+            await cache.redis_client.set(PAUSE_KEY, b"1", px=max(1, int(seconds * 1000)))
+    except Exception as e:
+        logger.error(f"Broadcast pause error: {e}")
+
+
+async def _pause_remaining() -> float:
+    delay = _paused_until - time.monotonic()
+    if cache.redis_client:
+        try:
+            delay = max(delay, await cache.redis_client.pttl(PAUSE_KEY) / 1000)
+        except Exception as e:
+            logger.error(f"Broadcast pause check error: {e}")
+    return delay
+
+
+async def _wait_for_send_slot():
+    """Global messages-per-second budget shared by every worker"""
+    while True:
+        delay = await _pause_remaining()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            continue
+        allowed, retry_after = await acquire(
+            "ratelimit:broadcast",
+            settings.BROADCAST_MESSAGES_PER_SECOND,
+            1
+        )
+        if allowed:
+            return
+        await asyncio.sleep(retry_after)
+
+
+async def _send_one(
+    bot: Bot,
+    user_id: int,
+    job: Dict[str, Any],
+    counters: Dict[str, Any],
+    lost: asyncio.Event
+):
+    for _ in range(settings.BROADCAST_MAX_RETRIES + 1):
+        await _wait_for_send_slot()
+        if lost.is_set():
+            return
+        try:
+            await bot.send_message(
+                chat_id=user_id,
+                text=job["message"],
+                parse_mode=job["parse_mode"]
+            )
+            counters["sent"] += 1
+            return
+        except TelegramRetryAfter as e:
+            # Flood control applies to the whole bot, so every sender backs off
+            counters["rate_limited"] += 1
+            await _pause_sending(e.retry_after)
+        except TelegramForbiddenError:
+            counters["blocked"] += 1
+            counters["blocked_ids"].append(user_id)
+            return
+        except Exception as e:
+            logger.debug(f"Broadcast failed for user {user_id}: {e}")
+            counters["failed"] += 1
+            return
+
+    counters["failed"] += 1
+
+
+async def _send_chunk(bot: Bot, job: Dict[str, Any], chunk: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Send one chunk with bounded concurrency, then persist checkpoint and counters.
+
+    Returns the updated job, or None if this worker no longer holds the lease.
+    """
+    db = get_database()
+    counters = {"sent": 0, "failed": 0, "blocked": 0, "rate_limited": 0, "blocked_ids": []}
+    semaphore = asyncio.Semaphore(settings.BROADCAST_CONCURRENCY)
+    lost = asyncio.Event()
+    started = time.monotonic()
+
+    async def send(user_id: int):
+        async with semaphore:
+            if not lost.is_set():
+                await _send_one(bot, user_id, job, counters, lost)
+
+    heartbeat = asyncio.create_task(_heartbeat(job["_id"], lost))
+    try:
+        await asyncio.gather(*[send(user["user_id"]) for user in chunk])
+    finally:
+        heartbeat.cancel()
+    if lost.is_set():
+        # The new lease holder resumes from the last checkpoint
+        return None
+
+    # Users who blocked the bot are skipped by later broadcasts
+    if counters["blocked_ids"]:
+        await db.users.update_many(
+            {"user_id": {"$in": counters["blocked_ids"]}},
+            {"$set": {"bot_blocked": True}}
+        )
+
+    elapsed = max(time.monotonic() - started, 1e-3)
+    now = datetime.utcnow()
+    return await db.broadcasts.find_one_and_update(
+        {"_id": job["_id"], "lease_owner": WORKER_ID},
+        {
+            "$set": {
+                "checkpoint": chunk[-1]["_id"],
+                "updated_at": now,
+                "messages_per_second": round(len(chunk) / elapsed, 2),
+                "lease_until": now + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS)
+            },
+            "$inc": {key: counters[key] for key in ("sent", "failed", "blocked", "rate_limited")}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _release_lease(job_id: ObjectId, **fields: Any):
+    db = get_database()
+    await db.broadcasts.update_one(
+        {"_id": job_id, "lease_owner": WORKER_ID},
+        {"$set": {"lease_owner": None, "lease_until": None, "messages_per_second": 0.0, **fields}}
+    )
+
+
+async def run_broadcast(job_id: str, bot: Bot):
+    """Run (or resume) a broadcast job from its last checkpoint"""
+    db = get_database()
+
+    job = await _acquire_lease(ObjectId(job_id))
+    if not job:
+        logger.info(f"Broadcast {job_id} is not runnable or leased by another worker")
+        return
+
+    query: Dict[str, Any] = {"is_banned": False, "bot_blocked": {"$ne": True}}
+    if job.get("total") is None:
+        # One count per job, for progress and ETA
+        total = await db.users.count_documents(query)
+        await db.broadcasts.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"total": total, "started_at": datetime.utcnow()}}
+        )
+    if job["checkpoint"]:
+        query["_id"] = {"$gt": job["checkpoint"]}
+        logger.info(f"Resuming broadcast {job_id} after {job['checkpoint']}")
+
+    cursor = db.users.find(query, {"user_id": 1}).sort("_id", 1).batch_size(settings.BROADCAST_CHUNK_SIZE)
+
+    chunk = []
+    async for user in cursor:
+        chunk.append(user)
+        if len(chunk) < settings.BROADCAST_CHUNK_SIZE:
+            continue
+        job = await _send_chunk(bot, job, chunk)
+        chunk = []
+        if not job:
+            logger.warning(f"Lost lease on broadcast {job_id}, stopping")
+            return
+        # Pause and cancel take effect at chunk boundaries
+        if job["status"] != "running":
+            await _release_lease(job["_id"])
+            logger.info(f"Broadcast {job_id} {job['status']}")
+            return
+    if chunk:
+        job = await _send_chunk(bot, job, chunk)
+        if not job:
+            logger.warning(f"Lost lease on broadcast {job_id}, stopping")
+            return
+
+    if job["status"] == "running":
+        job["status"] = "completed"
+        await _release_lease(job["_id"], status="completed", completed_at=datetime.utcnow())
+    else:
+        await _release_lease(job["_id"])
+    logger.info(
+        f"Broadcast {job_id} {job['status']}: {job['sent']} sent, {job['failed']} failed, "
+        f"{job['blocked']} blocked"
+    )
+
+
+def start_broadcast(job_id: str, bot: Bot):
+    """Run a job in the background of this worker"""
+    if job_id in _tasks and not _tasks[job_id].done():
+        return
+
+    async def runner():
+        try:
+            await run_broadcast(job_id, bot)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job_id} crashed, will resume from checkpoint: {e}", exc_info=True)
+        finally:
+            _tasks.pop(job_id, None)
+
+    _tasks[job_id] = asyncio.create_task(runner())
+
+
+async def get_broadcast(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a broadcast job by id"""
+    db = get_database()
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await db.broadcasts.find_one({"_id": ObjectId(job_id)}, {"message": 0})
+
+
+async def list_broadcasts(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent broadcast jobs first"""
+    db = get_database()
+    return await db.broadcasts.find({}, {"message": 0}).sort("_id", -1).limit(limit).to_list(limit)
+
+
+# action -> (statuses it applies to, new status)
+_TRANSITIONS = {
+    "pause": (["running"], "paused"),
+    "resume": (["paused"], "running"),
+    "cancel": (["running", "paused"], "cancelled")
+}
+
+
+async def set_broadcast_status(job_id: str, action: str, bot: Bot) -> Optional[Dict[str, Any]]:
+    """Pause, resume or cancel a job; returns None if the transition is not allowed"""
+    db = get_database()
+    allowed_from, new_status = _TRANSITIONS[action]
+    if not ObjectId.is_valid(job_id):
+        return None
+
+    job = await db.broadcasts.find_one_and_update(
+        {"_id": ObjectId(job_id), "status": {"$in": allowed_from}},
+        {"$set": {"status": new_status}},
+        projection={"message": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if job and new_status == "running":
+        start_broadcast(job_id, bot)
+    return job
+
+
+async def resume_broadcasts(bot: Bot):
+    """Pick up running jobs whose lease is free (after a crash or redeploy)"""
+    db = get_database()
+    async for job in db.broadcasts.find({"status": "running"}, {"_id": 1}):
+        start_broadcast(str(job["_id"]), bot)
+
+
+async def _supervise(bot: Bot):
+    while True:
+        try:
+            await resume_broadcasts(bot)
+        except Exception as e:
+            logger.error(f"Broadcast supervisor error: {e}")
+        await asyncio.sleep(settings.BROADCAST_LEASE_SECONDS)
+
+
+def start_broadcast_supervisor(bot: Bot):
+    """Periodically resume jobs whose lease has expired"""
+    global _supervisor_task
+    if _supervisor_task:
+        return
+    _supervisor_task = asyncio.create_task(_supervise(bot))
+
+
+async def stop_broadcasts():
+    """Stop local jobs and release their leases so another worker can resume them"""
+    global _supervisor_task
+    db = get_database()
+    if _supervisor_task:
+        _supervisor_task.cancel()
+        _supervisor_task = None
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await db.broadcasts.update_many(
+        {"lease_owner": WORKER_ID},
+        {"$set": {"lease_owner": None, "lease_until": None}}
+    )
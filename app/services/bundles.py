@@ -0,0 +1,145 @@
+from datetime import datetime
+from uuid import uuid4
+from typing import Optional, Dict, Any, List
+from pymongo import ReturnDocument
+from app.db.mongo import get_database
+from app.services.audits import log_audit
+from app.services.tiered_cache import TieredCache
+from app.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Deep link payloads starting with this refer to a bundle, not a file
+BUNDLE_PREFIX = "b_"
+
+# Most message ids Telegram accepts in one copyMessages call
+COPY_MESSAGES_LIMIT = 100
+
+
+def bundle_payload(bundle_uuid: str) -> str:
+    """Deep link start parameter for a bundle"""
+    return f"{BUNDLE_PREFIX}{bundle_uuid}"
+
+
+def bundle_link(bundle_uuid: str) -> str:
+    """Deep link that serves every file in a bundle"""
+    return f"https://t.me/{settings.BOT_USERNAME}?start={bundle_payload(bundle_uuid)}"
+
+
+async def create_bundle(owner_id: int, file_uuids: List[str], source: str = "album") -> Dict[str, Any]:
+    """Create a bundle: an ordered list of file UUIDs behind one deep link"""
+    db = get_database()
+    bundle = {
+        "uuid": str(uuid4()),
+        "owner_id": owner_id,
+        "file_uuids": file_uuids,
+        "source": source,
+        "created_at": datetime.utcnow()
+    }
+    result = await db.bundles.insert_one(bundle)
+    bundle["_id"] = result.inserted_id
+
+    await log_audit(owner_id, "BUNDLE_CREATED", bundle["uuid"])
+    logger.info(f"Created bundle {bundle['uuid']} with {len(file_uuids)} files for user {owner_id}")
+    return bundle
+
+
+async def get_bundle_by_uuid(bundle_uuid: str) -> Optional[Dict[str, Any]]:
+    """Get bundle by UUID"""
+    db = get_database()
+    return await db.bundles.find_one({"uuid": bundle_uuid})
+
+
+# Bundles never change after creation
+bundle_cache = TieredCache("bundle", get_bundle_by_uuid)
+
+
+async def get_bundle_files(bundle: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Live member files in bundle order, resolved with one $in query"""
+    db = get_database()
+    docs = await db.files.find({
+        "uuid": {"$in": bundle["file_uuids"]},
+        "deleted_at": None
+    }).to_list(len(bundle["file_uuids"]))
+    by_uuid = {doc["uuid"]: doc for doc in docs}
+    return [by_uuid[uuid] for uuid in bundle["file_uuids"] if uuid in by_uuid]
+
+
+# Draft bundles: an ordered set of file UUIDs on the user document
+# (users.bundle_draft), filled from /myfiles and turned into a bundle.
+
+async def get_bundle_draft(user_id: int) -> List[str]:
+    """UUIDs picked for the user's next bundle, in order"""
+    db = get_database()
+    user = await db.users.find_one({"user_id": user_id}, {"bundle_draft": 1})
+    return user.get("bundle_draft", []) if user else []
+
+
+async def add_to_bundle_draft(user_id: int, file_uuid: str) -> Optional[int]:
+    """Append a file to the draft; returns the draft size, or None if it is full"""
+    db = get_database()
+    # The size check and append are one atomic update
+    user = await db.users.find_one_and_update(
+        {"user_id": user_id, f"bundle_draft.{settings.BUNDLE_MAX_FILES - 1}": {"$exists": False}},
+        {"$addToSet": {"bundle_draft": file_uuid}},
+        projection={"bundle_draft": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return len(user["bundle_draft"]) if user else None
+
+
+async def remove_from_bundle_draft(user_id: int, file_uuid: str) -> int:
+    """Drop a file from the draft; returns the draft size"""
+    db = get_database()
+    user = await db.users.find_one_and_update(
+        {"user_id": user_id},
+        {"$pull": {"bundle_draft": file_uuid}},
+        projection={"bundle_draft": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return len(user.get("bundle_draft", [])) if user else 0
+
+
+async def clear_bundle_draft(user_id: int):
+    """Empty the user's draft"""
+    db = get_database()
+    await db.users.update_one({"user_id": user_id}, {"$unset": {"bundle_draft": ""}})
+
+
+async def create_bundle_from_draft(user_id: int) -> Optional[Dict[str, Any]]:
+    """Turn the draft into a bundle of the user's live files; None if none remain"""
+    db = get_database()
+    draft = await get_bundle_draft(user_id)
+    if not draft:
+        return None
+
+    # One $in query; files deleted or not owned by the user are dropped
+    docs = await db.files.find(
+        {"uuid": {"$in": draft}, "owner_id": user_id, "deleted_at": None},
+        {"uuid": 1}
+    ).to_list(len(draft))
+    live = {doc["uuid"] for doc in docs}
+    file_uuids = [uuid for uuid in draft if uuid in live]
+    if not file_uuids:
+        await clear_bundle_draft(user_id)
+        return None
+
+    bundle = await create_bundle(user_id, file_uuids, source="myfiles")
+    await clear_bundle_draft(user_id)
+    return bundle
+
+
+def storage_copy_batches(message_ids: List[int]) -> List[List[int]]:
+    """Split storage message ids into copy_messages calls.
+
+    copyMessages takes up to 100 strictly increasing ids, so a new batch is
+    started whenever the bundle order goes back, keeping delivery in order.
+    """
+    batches: List[List[int]] = []
+    for message_id in message_ids:
+        if batches and len(batches[-1]) < COPY_MESSAGES_LIMIT and message_id > batches[-1][-1]:
+            batches[-1].append(message_id)
+        else:
+            batches.append([message_id])
+    return batches
@@ -1,12 +1,17 @@
 import redis.asyncio as redis
 from app.config import settings
+import asyncio
 import logging
+import time
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 redis_client: Optional[redis.Redis] = None
 
+_reconnect_task: Optional[asyncio.Task] = None
+_last_reconnect_attempt = 0.0
+
 
 async def init_redis():
     """Initialize Redis connection"""
@@ -28,6 +33,31 @@ async def init_redis():
         logger.warning("⚠️ Redis URL not configured, caching disabled")
 
 
+async def try_lock(key: str, ttl: int) -> bool:
+    """Take a best-effort cross-worker lock; always succeeds without Redis"""
+    if not redis_client:
+        return True
+    try:
+        return bool(await redis_client.set(key, b"1", nx=True, ex=max(1, ttl)))
+    except Exception as e:
+        logger.error(f"Lock error for {key}: {e}")
+        return True
+
+
+def schedule_reconnect():
+    """Retry init_redis in the background, at most every REDIS_RECONNECT_INTERVAL seconds"""
+    global _reconnect_task, _last_reconnect_attempt
+    if redis_client or not settings.REDIS_URL:
+        return
+    if _reconnect_task and not _reconnect_task.done():
+        return
+    now = time.monotonic()
+    if now - _last_reconnect_attempt < settings.REDIS_RECONNECT_INTERVAL:
+        return
+    _last_reconnect_attempt = now
+    _reconnect_task = asyncio.create_task(init_redis())
+
+
 async def close_redis():
     """Close Redis connection"""
     if redis_client:
@@ -56,11 +86,11 @@ async def cache_set(key: str, value: bytes, ttl: int = 3600):
         logger.error(f"Cache set error: {e}")
 
 
-async def cache_delete(key: str):
-    """Delete key from cache"""
-    if not redis_client:
+async def cache_delete(*keys: str):
+    """Delete keys from cache"""
+    if not redis_client or not keys:
         return
     try:
-        await redis_client.delete(key)
+        await redis_client.delete(*keys)
     except Exception as e:
         logger.error(f"Cache delete error: {e}")
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.db.mongo import get_database
+from app.services import cache
+from app.config import settings
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "downloads:pending"
+
+# Read and clear the pending hash in one step so no increment is lost
+# between the read and the delete
+_DRAIN_SCRIPT = """
+local pending = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return pending
+"""
+
+_local_pending: Dict[str, int] = defaultdict(int)
+_flush_task: asyncio.Task = None
+
+
+async def record_download(uuid: str):
+    """Queue a download increment for the next flush"""
+    if cache.redis_client:
+        try:
+            await cache.redis_client.hincrby(PENDING_KEY, uuid, 1)
+            return
+        except Exception as e:
+            logger.error(f"Download counter error: {e}")
+    _local_pending[uuid] += 1
+
+
+async def get_pending_downloads(uuids: Iterable[str]) -> Dict[str, int]:
+    """Get increments not yet flushed to Mongo"""
+    uuids = list(uuids)
+    pending = {uuid: _local_pending.get(uuid, 0) for uuid in uuids}
+    if cache.redis_client and uuids:
+        try:
+            values = await cache.redis_client.hmget(PENDING_KEY, uuids)
+            for uuid, value in zip(uuids, values):
+                if value:
+                    pending[uuid] += int(value)
+        except Exception as e:
+            logger.error(f"Download counter read error: {e}")
+    return pending
+
+
+async def get_download_count(file_doc: Dict[str, Any]) -> int:
+    """Persisted download count plus pending increments"""
+    pending = await get_pending_downloads([file_doc["uuid"]])
+    return file_doc.get("downloads", 0) + pending[file_doc["uuid"]]
+
+
+async def get_download_counts(file_docs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Persisted plus pending download counts keyed by UUID"""
+    pending = await get_pending_downloads(f["uuid"] for f in file_docs)
+    return {f["uuid"]: f.get("downloads", 0) + pending[f["uuid"]] for f in file_docs}
+
+
+async def _drain() -> Dict[str, int]:
+    deltas: Dict[str, int] = defaultdict(int)
+
+    if cache.redis_client:
+        try:
+            raw = await cache.redis_client.eval(_DRAIN_SCRIPT, 1, PENDING_KEY)
+            for field, value in zip(raw[::2], raw[1::2]):
+                deltas[field.decode()] += int(value)
+        except Exception as e:
+            logger.error(f"Download counter drain error: {e}")
+
+    while _local_pending:
+        uuid, count = _local_pending.popitem()
+        deltas[uuid] += count
+
+    return deltas
+
+
+async def flush_downloads() -> int:
+    """Write pending increments to Mongo with a single bulk_write"""
+    from app.services.files import file_cache
+
+    deltas = await _drain()
+    if not deltas:
+        return 0
+
+    db = get_database()
+    items = list(deltas.items())
+    try:
+        await db.files.bulk_write(
+            [UpdateOne({"uuid": uuid}, {"$inc": {"downloads": count}}) for uuid, count in items],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        # Unordered: every operation not listed in writeErrors was applied
+        failed = [items[error["index"]] for error in e.details.get("writeErrors", [])]
+        logger.error(f"Download counter flush: {len(failed)} of {len(items)} increments failed")
+        for uuid, count in failed:
+            _local_pending[uuid] += count
+        failed_uuids = {uuid for uuid, _ in failed}
+        applied = [uuid for uuid, _ in items if uuid not in failed_uuids]
+        await file_cache.invalidate_many(applied)
+        return len(applied)
+    except Exception as e:
+        logger.error(f"Download counter flush error: {e}")
+        # Put the increments back so the next flush retries them
+        for uuid, count in deltas.items():
+            _local_pending[uuid] += count
+        return 0
+
+    # Cached documents now carry a stale persisted count
+    await file_cache.invalidate_many(list(deltas))
+
+    logger.debug(f"Flushed download counts for {len(deltas)} files")
+    return len(deltas)
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(settings.DOWNLOAD_FLUSH_INTERVAL)
+        try:
+            await flush_downloads()
+        except Exception as e:
+            logger.error(f"Download flush loop error: {e}")
+
+
+def start_download_flusher():
+    """Start the periodic flush task"""
+    global _flush_task
+    if _flush_task:
+        return
+    _flush_task = asyncio.create_task(_flush_loop())
+    logger.info("✅ Download counter flusher started")
+
+
+async def stop_download_flusher():
+    """Stop the periodic flush task and flush what is left"""
+    global _flush_task
+    if _flush_task:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await flush_downloads()
@@ -3,12 +3,32 @@ from uuid import uuid4
 from typing import Optional, Dict, Any, List
 from app.db.mongo import get_database
 from app.services.audits import log_audit
+from app.services.users import add_user_usage
+from app.services.stats import record_stats_event
+from app.services import leaderboard
+from app.config import settings
+from app.services.tiered_cache import TieredCache
+from app.services.downloads import record_download
+from app.services.storage import add_storage_reference, release_storage_reference
+from app.utils.pagination import keyset_filter
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-async def create_file_record(
+class QuotaExceededError(Exception):
+    """Upload would take the owner over their storage quota"""
+
+
+def get_storage_quota_bytes() -> Optional[int]:
+    """Per-user storage quota in bytes, or None when unlimited"""
+    if settings.USER_STORAGE_QUOTA_MB <= 0:
+        return None
+    return settings.USER_STORAGE_QUOTA_MB * 1024 * 1024
+
+
+def _new_file_doc(
     owner_id: int,
     file_type: str,
     storage_message_id: int,
@@ -17,13 +37,11 @@ async def create_file_record(
     file_name: Optional[str],
     mime_type: Optional[str],
     size_bytes: int,
-    width: Optional[int] = None,
-    height: Optional[int] = None
+    width: Optional[int],
+    height: Optional[int],
+    created_at: datetime
 ) -> Dict[str, Any]:
-    """Create a new file record in database"""
-    db = get_database()
-    
-    file_doc = {
+    return {
         "uuid": str(uuid4()),
         "owner_id": owner_id,
         "type": file_type,
@@ -36,54 +54,205 @@ async def create_file_record(
         "width": width,
         "height": height,
         "downloads": 0,
-        "created_at": datetime.utcnow(),
+        "created_at": created_at,
         "deleted_at": None
     }
+
+
+async def create_file_record(
+    owner_id: int,
+    file_type: str,
+    storage_message_id: int,
+    file_id: str,
+    file_unique_id: str,
+    file_name: Optional[str],
+    mime_type: Optional[str],
+    size_bytes: int,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    reused_storage: bool = False
+) -> Dict[str, Any]:
+    """Create a new file record in database.
+
+    `reused_storage` means storage_message_id is a deduplicated copy whose
+    reference was already taken with acquire_storage_object; the reference
+    is released again if the record cannot be created.
+
+    Raises QuotaExceededError if the owner's storage quota would be exceeded;
+    any exception means no record was created.
+    """
+    db = get_database()
     
-    result = await db.files.insert_one(file_doc)
+    # Reserve the counters first so the quota check and update are one atomic op
+    try:
+        if not await add_user_usage(owner_id, 1, size_bytes, get_storage_quota_bytes()):
+            raise QuotaExceededError(f"Storage quota exceeded for user {owner_id}")
+    except Exception:
+        if reused_storage:
+            await release_storage_reference(storage_message_id, size_bytes)
+        raise
+    
+    file_doc = _new_file_doc(
+        owner_id, file_type, storage_message_id, file_id, file_unique_id,
+        file_name, mime_type, size_bytes, width, height, datetime.utcnow()
+    )
+    
+    try:
+        result = await db.files.insert_one(file_doc)
+    except Exception:
+        await add_user_usage(owner_id, -1, -size_bytes)
+        if reused_storage:
+            await release_storage_reference(storage_message_id, size_bytes)
+        raise
     file_doc["_id"] = result.inserted_id
     
-    await log_audit(owner_id, "FILE_CREATED", file_doc["uuid"])
+    # Independent bookkeeping writes; the record exists, so failures are only logged
+    writes = [
+        record_stats_event(files=1, storage_bytes=size_bytes, hourly={"files_created": 1}),
+        log_audit(owner_id, "FILE_CREATED", file_doc["uuid"])
+    ]
+    if not reused_storage:
+        writes.append(add_storage_reference(storage_message_id, file_unique_id, size_bytes))
+    for error in await asyncio.gather(*writes, return_exceptions=True):
+        if isinstance(error, Exception):
+            logger.error(f"Bookkeeping error for file {file_doc['uuid']}: {error}")
     logger.info(f"Created file record {file_doc['uuid']} for user {owner_id}")
     
     return file_doc
 
 
+async def create_file_records(owner_id: int, files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Create several file records with one quota reservation and one insert_many.
+
+    Each item holds create_file_record's keyword arguments except owner_id;
+    records are returned in the same order.
+
+    Raises QuotaExceededError if the batch as a whole would exceed the quota;
+    any exception means no record was created.
+    """
+    db = get_database()
+    total_bytes = sum(f["size_bytes"] for f in files)
+    reused = [f for f in files if f.get("reused_storage")]
+    
+    async def release_reused():
+        for f in reused:
+            await release_storage_reference(f["storage_message_id"], f["size_bytes"])
+    
+    try:
+        if not await add_user_usage(owner_id, len(files), total_bytes, get_storage_quota_bytes()):
+            raise QuotaExceededError(f"Storage quota exceeded for user {owner_id}")
+    except Exception:
+        await release_reused()
+        raise
+    
+    created_at = datetime.utcnow()
+    file_docs = [
+        _new_file_doc(
+            owner_id, f["file_type"], f["storage_message_id"], f["file_id"], f["file_unique_id"],
+            f.get("file_name"), f.get("mime_type"), f["size_bytes"], f.get("width"), f.get("height"),
+            created_at
+        )
+        for f in files
+    ]
+    
+    try:
+        # insert_many sets _id on each document
+        await db.files.insert_many(file_docs)
+    except Exception:
+        await add_user_usage(owner_id, -len(files), -total_bytes)
+        await release_reused()
+        raise
+    
+    writes = [
+        record_stats_event(files=len(files), storage_bytes=total_bytes, hourly={"files_created": len(files)})
+    ]
+    for f, file_doc in zip(files, file_docs):
+        writes.append(log_audit(owner_id, "FILE_CREATED", file_doc["uuid"]))
+        if not f.get("reused_storage"):
+            writes.append(add_storage_reference(f["storage_message_id"], f["file_unique_id"], f["size_bytes"]))
+    for error in await asyncio.gather(*writes, return_exceptions=True):
+        if isinstance(error, Exception):
+            logger.error(f"Bookkeeping error for files of user {owner_id}: {error}")
+    logger.info(f"Created {len(file_docs)} file records for user {owner_id}")
+    
+    return file_docs
+
+
+async def discard_file_records(owner_id: int, file_docs: List[Dict[str, Any]]) -> List[int]:
+    """Undo create_file_records for records the user never got a link to.
+
+    Returns the storage message ids no live record refers to any more,
+    which the caller may delete from the storage channel.
+    """
+    db = get_database()
+    total_bytes = sum(d["size_bytes"] for d in file_docs)
+    
+    await db.files.delete_many({"uuid": {"$in": [d["uuid"] for d in file_docs]}})
+    await add_user_usage(owner_id, -len(file_docs), -total_bytes)
+    await record_stats_event(
+        files=-len(file_docs), storage_bytes=-total_bytes, hourly={"files_created": -len(file_docs)}
+    )
+    
+    unreferenced = []
+    for file_doc in file_docs:
+        if await release_storage_reference(file_doc["storage_channel_message_id"], file_doc["size_bytes"]):
+            unreferenced.append(file_doc["storage_channel_message_id"])
+        await log_audit(owner_id, "FILE_DISCARDED", file_doc["uuid"])
+    logger.info(f"Discarded {len(file_docs)} file records for user {owner_id}")
+    
+    return unreferenced
+
+
 async def get_file_by_uuid(uuid: str) -> Optional[Dict[str, Any]]:
     """Get file by UUID"""
     db = get_database()
     return await db.files.find_one({"uuid": uuid})
 
 
+file_cache = TieredCache("file", get_file_by_uuid)
+
+
+async def get_cached_file(uuid: str) -> Optional[Dict[str, Any]]:
+    """Get file by UUID through the two-tier metadata cache"""
+    return await file_cache.get(uuid)
+
+
 async def increment_downloads(uuid: str):
-    """Increment download count for file"""
-    db = get_database()
-    await db.files.update_one(
-        {"uuid": uuid},
-        {"$inc": {"downloads": 1}}
-    )
+    """Increment download count for file (write-behind, flushed periodically)"""
+    await record_download(uuid)
 
 
 async def get_user_files(
     user_id: int,
-    page: int = 1,
-    page_size: int = 10
+    cursor: Optional[str] = None,
+    page_size: int = 10,
+    before: bool = False
 ) -> List[Dict[str, Any]]:
-    """Get paginated files for user"""
+    """Get a page of files for user, newest first.
+
+    `cursor` is a token from encode_cursor; the page after it is returned,
+    or the page before it when `before` is set.
+    """
     db = get_database()
     
-    skip = (page - 1) * page_size
-    
-    cursor = db.files.find({
+    query = {
         "owner_id": user_id,
-        "deleted_at": None
-    }).sort("created_at", -1).skip(skip).limit(page_size)
+        "deleted_at": None,
+        **keyset_filter(cursor, before)
+    }
+    direction = 1 if before else -1
+    
+    files = await db.files.find(query).sort(
+        [("created_at", direction), ("_id", direction)]
+    ).limit(page_size).to_list(length=page_size)
     
-    return await cursor.to_list(length=page_size)
+    if before:
+        files.reverse()
+    return files
 
 
 async def count_user_files(user_id: int) -> int:
-    """Count non-deleted files for user"""
+    """Count non-deleted files for user (full count, prefer get_user_usage)"""
     db = get_database()
     return await db.files.count_documents({
         "owner_id": user_id,
@@ -95,10 +264,19 @@ async def soft_delete_file(uuid: str, actor_id: int):
     """Soft delete file"""
     db = get_database()
     
-    await db.files.update_one(
-        {"uuid": uuid},
-        {"$set": {"deleted_at": datetime.utcnow()}}
+    # Only a live -> deleted transition touches the owner's counters
+    file_doc = await db.files.find_one_and_update(
+        {"uuid": uuid, "deleted_at": None},
+        {"$set": {"deleted_at": datetime.utcnow()}},
+        projection={"owner_id": 1, "size_bytes": 1, "storage_channel_message_id": 1}
     )
+    if file_doc:
+        await add_user_usage(file_doc["owner_id"], -1, -file_doc["size_bytes"])
+        # Other owners' records may share the storage message
+        await release_storage_reference(file_doc["storage_channel_message_id"], file_doc["size_bytes"])
+        await record_stats_event(files=-1, deleted_files=1, storage_bytes=-file_doc["size_bytes"])
+        await leaderboard.remove_file(uuid)
+    await file_cache.invalidate(uuid)
     
     await log_audit(actor_id, "FILE_DELETED", uuid)
     logger.info(f"Soft deleted file {uuid} by user {actor_id}")
@@ -108,10 +286,21 @@ async def restore_file(uuid: str, actor_id: int):
     """Restore soft-deleted file"""
     db = get_database()
     
-    await db.files.update_one(
-        {"uuid": uuid},
-        {"$set": {"deleted_at": None}}
+    file_doc = await db.files.find_one_and_update(
+        {"uuid": uuid, "deleted_at": {"$ne": None}},
+        {"$set": {"deleted_at": None}},
+        projection={"owner_id": 1, "size_bytes": 1, "storage_channel_message_id": 1, "file_unique_id": 1}
     )
+    if file_doc:
+        await add_user_usage(file_doc["owner_id"], 1, file_doc["size_bytes"])
+        await add_storage_reference(
+            file_doc["storage_channel_message_id"],
+            file_doc["file_unique_id"],
+            file_doc["size_bytes"]
+        )
+        await record_stats_event(files=1, deleted_files=-1, storage_bytes=file_doc["size_bytes"])
+        await leaderboard.restore_file(uuid)
+    await file_cache.invalidate(uuid)
     
     await log_audit(actor_id, "FILE_RESTORED", uuid)
     logger.info(f"Restored file {uuid} by user {actor_id}")
@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from app.db.mongo import get_database
+from app.services import cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALL_TIME_KEY = "lb:all"
+SEEDED_KEY = "lb:seeded"
+
+# window -> (bucket key format, bucket length, number of buckets)
+WINDOWS = {
+    "24h": ("lb:h:%Y%m%d%H", timedelta(hours=1), 24),
+    "7d": ("lb:d:%Y%m%d", timedelta(days=1), 7)
+}
+
+# Merged window sets are rebuilt at most this often
+WINDOW_CACHE_TTL = 60
+
+
+def _bucket_keys(window: str, now: datetime) -> List[str]:
+    key_format, step, count = WINDOWS[window]
+    return [(now - step * i).strftime(key_format) for i in range(count)]
+
+
+def _window_key(window: str) -> str:
+    return f"lb:win:{window}"
+
+
+async def record_serve(uuid: str):
+    """Count a successful serve in the all-time and time-bucketed sets"""
+    if not cache.redis_client:
+        return
+    now = datetime.utcnow()
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zincrby(ALL_TIME_KEY, 1, uuid)
+            for window, (key_format, step, count) in WINDOWS.items():
+                key = now.strftime(key_format)
+                pipe.zincrby(key, 1, uuid)
+                pipe.expire(key, int((step * (count + 1)).total_seconds()))
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Leaderboard update error: {e}")
+
+
+async def remove_file(uuid: str):
+    """Take a file off every board, archiving its scores for restore"""
+    if not cache.redis_client:
+        return
+    keys = [ALL_TIME_KEY]
+    for window in WINDOWS:
+        keys += _bucket_keys(window, datetime.utcnow())
+
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.zscore(key, uuid)
+            scores = await pipe.execute()
+
+        archived = {key: score for key, score in zip(keys, scores) if score}
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            if archived:
+                pipe.hset(f"lb:archived:{uuid}", mapping=archived)
+            for key in keys + [_window_key(w) for w in WINDOWS]:
+                pipe.zrem(key, uuid)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Leaderboard remove error for {uuid}: {e}")
+
+
+async def restore_file(uuid: str):
+    """Put a restored file's archived scores back"""
+    if not cache.redis_client:
+        return
+    archive_key = f"lb:archived:{uuid}"
+    try:
+        archived = await cache.redis_client.hgetall(archive_key)
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            for key, score in archived.items():
+                key = key.decode()
+                # Buckets that expired while the file was deleted stay gone
+                if key == ALL_TIME_KEY or await cache.redis_client.exists(key):
+                    pipe.zincrby(key, float(score), uuid)
+            pipe.delete(archive_key)
+            for window in WINDOWS:
+                pipe.delete(_window_key(window))
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Leaderboard restore error for {uuid}: {e}")
+
+
+async def seed_leaderboard(batch_size: int = 1000) -> int:
+    """Load all-time scores from Mongo download counts (one-off backfill)"""
+    from app.services.downloads import get_download_counts
+
+    if not await cache.try_lock("lock:lb:seed", 300):
+        return 0
+
+    db = get_database()
+    cursor = db.files.find(
+        {"deleted_at": None, "downloads": {"$gt": 0}},
+        {"uuid": 1, "downloads": 1}
+    )
+    seeded = 0
+    batch = []
+
+    async def flush():
+        counts = await get_download_counts(batch)
+        await cache.redis_client.zadd(ALL_TIME_KEY, counts)
+
+    try:
+        async for file_doc in cursor:
+            batch.append(file_doc)
+            if len(batch) >= batch_size:
+                await flush()
+                seeded += len(batch)
+                batch = []
+        if batch:
+            await flush()
+            seeded += len(batch)
+
+        await cache.redis_client.set(SEEDED_KEY, b"1")
+    except Exception as e:
+        logger.error(f"Leaderboard seed error after {seeded} files: {e}")
+        # Let the next request retry instead of waiting out the lock
+        await cache.cache_delete("lock:lb:seed")
+        return seeded
+
+    logger.info(f"Seeded leaderboard with {seeded} files")
+    return seeded
+
+
+async def get_top_files(window: str = "all", limit: int = 10) -> Optional[List[Tuple[str, int]]]:
+    """Top (uuid, serves) pairs for "all", "24h" or "7d"; empty without Redis.
+
+    None while another worker is still seeding the all-time board, or when
+    Redis fails; callers fall back to Mongo then.
+    """
+    if not cache.redis_client:
+        return []
+    if window != "all" and window not in WINDOWS:
+        raise ValueError(f"Unknown leaderboard window: {window}")
+
+    try:
+        return await _read_top_files(window, limit)
+    except Exception as e:
+        logger.error(f"Leaderboard read error for {window}: {e}")
+        return None
+
+
+async def _read_top_files(window: str, limit: int) -> Optional[List[Tuple[str, int]]]:
+    if window == "all":
+        key = ALL_TIME_KEY
+        if not await cache.redis_client.exists(SEEDED_KEY):
+            await seed_leaderboard()
+            # The seed lock was held elsewhere and the board is still partial
+            if not await cache.redis_client.exists(SEEDED_KEY):
+                return None
+    else:
+        key = _window_key(window)
+        if not await cache.redis_client.exists(key):
+            buckets = _bucket_keys(window, datetime.utcnow())
+            async with cache.redis_client.pipeline(transaction=True) as pipe:
+                pipe.zunionstore(key, buckets)
+                pipe.expire(key, WINDOW_CACHE_TTL)
+                await pipe.execute()
+
+    entries = await cache.redis_client.zrevrange(key, 0, limit - 1, withscores=True)
+    return [(uuid.decode(), int(score)) for uuid, score in entries]
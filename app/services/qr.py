@@ -1,47 +1,177 @@
 import qrcode
 from io import BytesIO
 from PIL import Image
-from aiogram.types import BufferedInputFile
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
 from app.config import settings
-from app.services.cache import cache_get, cache_set
+from app.db.mongo import get_database
+from app.services.cache import cache_get, cache_set, cache_delete
+from app.services.files import get_cached_file, file_cache
+from app.services.bundles import BUNDLE_PREFIX
+import asyncio
+import multiprocessing
 import logging
 
 logger = logging.getLogger(__name__)
 
+QR_FILE_ID_TTL = 30 * 86400
+QR_IMAGE_SIZE = 512
 
-async def generate_qr_code(uuid: str) -> BufferedInputFile:
-    """Generate QR code for file deep link with 7-day caching"""
-    cache_key = f"qr:{uuid}"
-    
-    # Try cache first
-    cached = await cache_get(cache_key)
-    if cached:
-        logger.debug(f"QR cache hit for {uuid}")
-        return BufferedInputFile(cached, filename="qr_code.png")
-    
-    # Generate QR
-    deep_link = f"https://t.me/{settings.BOT_USERNAME}?start={uuid}"
-    
+# Telegram errors meaning the stored file_id itself is unusable
+FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file reference")
+
+_executor: Optional[Executor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def render_qr_png(deep_link: str, size: int = QR_IMAGE_SIZE) -> bytes:
+    """Render a deep link as a size x size 1-bit PNG (CPU-bound, runs in the worker pool).
+
+    The module matrix is scaled by an integer box size with nearest-neighbour
+    sampling, so every module is a crisp square and the PNG stays small.
+    """
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
         border=2
     )
     qr.add_data(deep_link)
     qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    img = img.resize((512, 512), Image.Resampling.LANCZOS)
-    
+
+    matrix = qr.get_matrix()
+    modules = len(matrix)
+    box_size = max(1, size // modules)
+
+    pixels = bytes(0 if dark else 255 for row in matrix for dark in row)
+    img = Image.frombytes("L", (modules, modules), pixels).convert("1", dither=Image.Dither.NONE)
+    img = img.resize((modules * box_size, modules * box_size), Image.Resampling.NEAREST)
+
+    # Centre on a white canvas; the leftover pixels just widen the quiet zone
+    if img.size[0] != size:
+        canvas = Image.new("1", (size, size), 1)
+        offset = (size - img.size[0]) // 2
+        canvas.paste(img, (offset, offset))
+        img = canvas
+
     buffer = BytesIO()
+    # optimize=True costs ~2ms per render for ~5% smaller files; not worth it here
     img.save(buffer, format='PNG')
-    qr_bytes = buffer.getvalue()
-    
+    return buffer.getvalue()
+
+
+def get_qr_executor() -> Executor:
+    """Thread or process pool for QR rendering, per QR_RENDER_EXECUTOR"""
+    global _executor
+    if _executor is None:
+        if settings.QR_RENDER_EXECUTOR == "process":
+            # spawn: forking a process that already runs threads and an event loop is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.QR_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QR_RENDER_WORKERS,
+                thread_name_prefix="qr"
+            )
+    return _executor
+
+
+def shutdown_qr_executor():
+    """Shut down the render pool"""
+    global _executor
+    if _executor:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _render(uuid: str) -> bytes:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.QR_RENDER_MAX_PENDING)
+
+    deep_link = f"https://t.me/{settings.BOT_USERNAME}?start={uuid}"
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        qr_bytes = await loop.run_in_executor(get_qr_executor(), render_qr_png, deep_link)
+
     # Cache for 7 days
-    await cache_set(cache_key, qr_bytes, ttl=604800)
-    
+    await cache_set(f"qr:{uuid}", qr_bytes, ttl=604800)
     logger.info(f"Generated QR code for {uuid}")
-    
+    return qr_bytes
+
+
+async def get_qr_png(uuid: str) -> bytes:
+    """QR PNG bytes for a file, from cache or a single coalesced render"""
+    cached = await cache_get(f"qr:{uuid}")
+    if cached:
+        logger.debug(f"QR cache hit for {uuid}")
+        return cached
+
+    # Concurrent requests for the same UUID share one render
+    future = _inflight.get(uuid)
+    if future is None:
+        future = asyncio.ensure_future(_render(uuid))
+        _inflight[uuid] = future
+        future.add_done_callback(lambda _: _inflight.pop(uuid, None))
+    return await asyncio.shield(future)
+
+
+async def generate_qr_code(uuid: str) -> BufferedInputFile:
+    """Generate QR code for file deep link with 7-day caching"""
+    qr_bytes = await get_qr_png(uuid)
+
     # Return BufferedInputFile for aiogram v3
     return BufferedInputFile(qr_bytes, filename="qr_code.png")
+
+
+async def get_qr_file_id(uuid: str) -> Optional[str]:
+    """Telegram file_id of a previously sent QR photo, if any"""
+    cached = await cache_get(f"qr:fid:{uuid}")
+    if cached:
+        return cached.decode()
+    if uuid.startswith(BUNDLE_PREFIX):
+        return None
+    file_doc = await get_cached_file(uuid)
+    return file_doc.get("qr_file_id") if file_doc else None
+
+
+async def _set_qr_file_id(uuid: str, file_id: Optional[str]):
+    db = get_database()
+    if file_id:
+        await cache_set(f"qr:fid:{uuid}", file_id.encode(), ttl=QR_FILE_ID_TTL)
+    else:
+        await cache_delete(f"qr:fid:{uuid}")
+    if uuid.startswith(BUNDLE_PREFIX):
+        # Bundle QR file_ids live in Redis only
+        return
+    await db.files.update_one({"uuid": uuid}, {"$set": {"qr_file_id": file_id}})
+    await file_cache.invalidate(uuid)
+
+
+async def send_qr_photo(bot: Bot, chat_id: int, uuid: str, **kwargs: Any) -> Message:
+    """Send the QR photo, reusing Telegram's file_id instead of re-uploading the PNG.
+
+    Falls back to uploading bytes when there is no file_id yet or Telegram
+    rejects the stored one; the file_id of that upload is remembered.
+    """
+    file_id = await get_qr_file_id(uuid)
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except TelegramBadRequest as e:
+            # Other bad requests (chat, caption, ...) would fail the upload too
+            if not any(marker in e.message.lower() for marker in FILE_ID_ERRORS):
+                raise
+            logger.warning(f"Stored QR file_id rejected for {uuid}, re-uploading: {e}")
+            await _set_qr_file_id(uuid, None)
+
+    qr_file = await generate_qr_code(uuid)
+    sent = await bot.send_photo(chat_id=chat_id, photo=qr_file, **kwargs)
+    if sent.photo:
+        await _set_qr_file_id(uuid, sent.photo[-1].file_id)
+    return sent
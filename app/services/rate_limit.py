@@ -1,60 +1,169 @@
-from app.services.cache import redis_client
+from collections import OrderedDict
+from typing import Dict, Tuple
+from app.services import cache
 from app.config import settings
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Generic cell rate algorithm: one key per limiter holding the theoretical
+# arrival time (TAT) in milliseconds. Read, decide and write happen inside a
+# single script, so concurrent callers can never over-admit.
+#
+# KEYS[1] - limiter key
+# ARGV[1] - limit (requests per period)
+# ARGV[2] - period in milliseconds
+# ARGV[3] - cost of this request
+#
+# Returns {allowed (0/1), retry_after_ms, remaining}
+GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
 
-async def check_rate_limit(user_id: int) -> bool:
-    """Check if user is within rate limit using sliding window"""
-    if not redis_client:
-        return True
-    
-    key = f"ratelimit:user:{user_id}"
-    now = int(time.time())
-    window = 60  # 1 minute
-    
-    try:
-        # Remove old entries
-        await redis_client.zremrangebyscore(key, 0, now - window)
-        
-        # Count requests in window
-        count = await redis_client.zcard(key)
-        
-        if count >= settings.USER_RATE_LIMIT_PER_MIN:
-            logger.warning(f"Rate limit exceeded for user {user_id}")
-            return False
-        
-        # Add current request
-        await redis_client.zadd(key, {str(now): now})
-        await redis_client.expire(key, window)
-        
-        return True
-    except Exception as e:
-        logger.error(f"Rate limit check error: {e}")
-        return True
-
-
-async def check_global_rate_limit() -> bool:
-    """Check global rate limit"""
-    if not redis_client:
-        return True
-    
-    key = "ratelimit:global"
-    now = int(time.time())
-    
-    try:
-        await redis_client.zremrangebyscore(key, 0, now - 1)
-        count = await redis_client.zcard(key)
-        
-        if count >= settings.GLOBAL_RATE_LIMIT_RPS:
-            return False
-        
-        await redis_client.zadd(key, {f"{now}:{count}": now})
-        await redis_client.expire(key, 2)
-        
-        return True
-    except Exception as e:
-        logger.error(f"Global rate limit error: {e}")
-        return True
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+local emission = period / limit
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission * cost
+local allow_at = new_tat - period
+
+if now < allow_at then
+    return {0, math.ceil(allow_at - now), 0}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, 0, math.floor((now - allow_at) / emission)}
+"""
+
+
+class LocalRateLimiter:
+    """Memory-bounded in-process token buckets.
+
+    Keys are spread over shards, each an LRU capped at max_keys / shards
+    entries, so idle keys are evicted first and memory stays bounded.
+    """
+
+    def __init__(self, shards: int, max_keys: int):
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._max_per_shard = max(1, max_keys // shards)
+        self.evictions = 0
+
+    def acquire(self, key: str, limit: int, period: float, cost: int = 1) -> Tuple[bool, float]:
+        """Take `cost` tokens from a bucket of `limit` refilled every `period` seconds"""
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        rate = limit / period
+
+        entry = shard.get(key)
+        if entry:
+            tokens, updated_at = entry
+            tokens = min(limit, tokens + (now - updated_at) * rate)
+            shard.move_to_end(key)
+        else:
+            tokens = limit
+
+        if tokens >= cost:
+            tokens -= cost
+            allowed, retry_after = True, 0.0
+        else:
+            allowed, retry_after = False, (cost - tokens) / rate
+
+        shard[key] = (tokens, now)
+        if len(shard) > self._max_per_shard:
+            shard.popitem(last=False)
+            self.evictions += 1
+
+        return allowed, retry_after
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+_local = LocalRateLimiter(settings.LOCAL_RATE_LIMIT_SHARDS, settings.LOCAL_RATE_LIMIT_MAX_KEYS)
+
+_script = None
+_script_client = None
+
+# After a Redis error, decide locally until this monotonic timestamp
+_redis_retry_at = 0.0
+
+_decisions = {
+    "redis": 0,
+    "local": 0
+}
+
+
+def _get_script():
+    """Register the GCRA script against the current Redis client"""
+    global _script, _script_client
+    if _script_client is not cache.redis_client:
+        _script = cache.redis_client.register_script(GCRA_SCRIPT)
+        _script_client = cache.redis_client
+    return _script
+
+
+async def acquire(key: str, limit: int, period: float, cost: int = 1) -> Tuple[bool, float]:
+    """Take `cost` units from a `limit` per `period` seconds limiter.
+
+    Returns (allowed, retry_after_seconds) in a single Redis round trip.
+    Falls back to the in-process limiter while Redis is missing or erroring
+    and switches back once it answers again.
+    """
+    global _redis_retry_at
+
+    if cache.redis_client and time.monotonic() >= _redis_retry_at:
+        try:
+            allowed, retry_after_ms, _ = await _get_script()(
+                keys=[key],
+                args=[limit, int(period * 1000), cost]
+            )
+            _decisions["redis"] += 1
+            return bool(allowed), retry_after_ms / 1000
+        except Exception as e:
+            logger.error(f"Rate limit check error for {key}, using local limiter: {e}")
+            _redis_retry_at = time.monotonic() + settings.RATE_LIMIT_REDIS_RETRY
+    elif not cache.redis_client:
+        cache.schedule_reconnect()
+
+    _decisions["local"] += 1
+    return _local.acquire(key, limit, period, cost)
+
+
+async def check_rate_limit(user_id: int, cost: int = 1) -> bool:
+    """Check if user is within the per-minute rate limit"""
+    allowed, _ = await acquire(
+        f"ratelimit:user:{user_id}",
+        settings.USER_RATE_LIMIT_PER_MIN,
+        60,
+        cost
+    )
+    if not allowed:
+        logger.warning(f"Rate limit exceeded for user {user_id}")
+    return allowed
+
+
+async def check_global_rate_limit(cost: int = 1) -> bool:
+    """Check global requests-per-second limit"""
+    allowed, _ = await acquire(
+        "ratelimit:global",
+        settings.GLOBAL_RATE_LIMIT_RPS,
+        1,
+        cost
+    )
+    return allowed
+
+
+def get_rate_limit_stats() -> Dict[str, int]:
+    """How many decisions were made in Redis versus locally"""
+    return {
+        **_decisions,
+        "local_keys": len(_local),
+        "local_evictions": _local.evictions
+    }
@@ -0,0 +1,109 @@
+from typing import Awaitable, Callable
+from app.services import cache
+from app.config import settings
+import asyncio
+import secrets
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How often followers check whether the leader has finished
+POLL_INTERVAL = 0.2
+
+# Compare-and-delete / compare-and-extend, so a leader whose lock expired
+# never releases or extends the lock of the worker that took over
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _lock_key(name: str) -> str:
+    return f"startup:{name}:lock"
+
+
+def _done_key(name: str) -> str:
+    return f"startup:{name}:done"
+
+
+async def _is_done(name: str) -> bool:
+    return await cache.cache_get(_done_key(name)) is not None
+
+
+async def _acquire(key: str, token: str) -> bool:
+    """Take the lock holding `token`; True on Redis errors so startup goes on"""
+    try:
+        return bool(await cache.redis_client.set(key, token, nx=True, ex=settings.STARTUP_LOCK_TTL))
+    except Exception as e:
+        logger.error(f"Startup lock error for {key}: {e}")
+        return True
+
+
+async def _release(key: str, token: str):
+    try:
+        await cache.redis_client.eval(_RELEASE_SCRIPT, 1, key, token)
+    except Exception as e:
+        logger.error(f"Startup lock release error for {key}: {e}")
+
+
+async def _keep_lock(key: str, token: str):
+    """Extend the lock every third of its TTL while the task runs"""
+    interval = max(1, settings.STARTUP_LOCK_TTL) / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await cache.redis_client.eval(_RENEW_SCRIPT, 1, key, token, settings.STARTUP_LOCK_TTL):
+                logger.warning(f"Startup lock {key} was lost, another worker may repeat the task")
+                return
+        except Exception as e:
+            logger.error(f"Startup lock renewal error for {key}: {e}")
+
+
+async def run_once(name: str, func: Callable[[], Awaitable[None]]):
+    """Run a startup task in one worker process only.
+
+    The first worker to take the Redis lock runs `func` and marks the task
+    done for STARTUP_TASK_TTL seconds; the others wait for that mark
+    instead of repeating the work. If the leader dies before finishing,
+    the lock expires and a waiting worker takes over; a live leader keeps
+    extending it, however long `func` takes. Without Redis every
+    worker runs `func` itself.
+    """
+    if not cache.redis_client:
+        await func()
+        return
+
+    deadline = time.monotonic() + settings.STARTUP_WAIT_TIMEOUT
+    while True:
+        if await _is_done(name):
+            logger.info(f"Startup task '{name}' already done by another worker")
+            return
+
+        token = secrets.token_hex(16)
+        if await _acquire(_lock_key(name), token):
+            keeper = asyncio.create_task(_keep_lock(_lock_key(name), token))
+            try:
+                await func()
+                await cache.cache_set(_done_key(name), b"1", settings.STARTUP_TASK_TTL)
+                logger.info(f"Startup task '{name}' done")
+            finally:
+                keeper.cancel()
+                await asyncio.gather(keeper, return_exceptions=True)
+                await _release(_lock_key(name), token)
+            return
+
+        while await cache.cache_get(_lock_key(name)) is not None:
+            if time.monotonic() > deadline:
+                logger.warning(f"Timed out waiting for startup task '{name}', continuing without it")
+                return
+            await asyncio.sleep(POLL_INTERVAL)
@@ -1,90 +1,259 @@
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from app.db.mongo import get_database
-from app.services.cache import cache_get, cache_set
+from app.services import cache
+from app.services.cache import cache_get, cache_set, try_lock
+from app.services.downloads import get_download_counts
+from app.services.leaderboard import get_top_files
+from app.config import settings
+import asyncio
+import logging
 import orjson
 
+logger = logging.getLogger(__name__)
+
+TOTALS_ID = "totals"
+WINDOW_HOURS = 24
+
+# Bump when reconcile_stats starts maintaining a new counter
+TOTALS_VERSION = 2
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _active_key(at: datetime) -> str:
+    return f"stats:active:{at:%Y%m%d%H}"
+
+
+async def record_stats_event(hourly: Optional[Dict[str, int]] = None, **totals: int):
+    """Apply an event to the headline counters and the current hourly bucket.
+
+    Example: record_stats_event(files=1, storage_bytes=size, hourly={"files_created": 1})
+    """
+    db = get_database()
+    try:
+        if totals:
+            await db.stats.update_one(
+                {"_id": TOTALS_ID},
+                {"$inc": totals},
+                upsert=True
+            )
+        if hourly:
+            hour = _hour(datetime.utcnow())
+            await db.stats.update_one(
+                {"_id": f"hour:{hour:%Y%m%d%H}"},
+                {"$inc": hourly, "$setOnInsert": {"at": hour}},
+                upsert=True
+            )
+    except Exception as e:
+        # Counters drift at worst; the periodic reconciliation repairs them
+        logger.error(f"Stats event error: {e}")
+
+
+async def record_active_user(user_id: int):
+    """Add a user to the current hour's active-users HyperLogLog"""
+    if not cache.redis_client:
+        return
+    key = _active_key(datetime.utcnow())
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            pipe.pfadd(key, user_id)
+            pipe.expire(key, (WINDOW_HOURS + 1) * 3600)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Active user tracking error: {e}")
+
+
+async def _count_active_24h(now: datetime) -> int:
+    if cache.redis_client:
+        try:
+            keys = [_active_key(now - timedelta(hours=h)) for h in range(WINDOW_HOURS)]
+            return await cache.redis_client.pfcount(*keys)
+        except Exception as e:
+            logger.error(f"Active user count error: {e}")
+    # Fallback: range count on the last_seen_at index
+    db = get_database()
+    return await db.users.count_documents({
+        "last_seen_at": {"$gte": now - timedelta(hours=WINDOW_HOURS)}
+    })
+
+
+async def reconcile_stats() -> Dict[str, int]:
+    """Recompute the headline counters from the collections.
+
+    Queries run concurrently. The counts and the storage total use the
+    is_banned, deleted_at and (deleted_at, size_bytes) indexes; the physical
+    total groups every live file by storage message, a full scan of the
+    live records (storage_objects cannot replace it while records from
+    before deduplication have no storage object).
+    """
+    db = get_database()
+
+    storage_pipeline = [
+        {"$match": {"deleted_at": None}},
+        {"$project": {"_id": 0, "size_bytes": 1}},
+        {"$group": {"_id": None, "total": {"$sum": "$size_bytes"}}}
+    ]
+    # Deduplicated records share a storage message; count each message once
+    physical_pipeline = [
+        {"$match": {"deleted_at": None}},
+        {"$group": {"_id": "$storage_channel_message_id", "size_bytes": {"$first": "$size_bytes"}}},
+        {"$group": {"_id": None, "total": {"$sum": "$size_bytes"}}}
+    ]
+
+    users, banned, files, deleted, storage, physical = await asyncio.gather(
+        db.users.estimated_document_count(),
+        db.users.count_documents({"is_banned": True}),
+        db.files.count_documents({"deleted_at": None}),
+        db.files.count_documents({"deleted_at": {"$ne": None}}),
+        db.files.aggregate(storage_pipeline).to_list(1),
+        db.files.aggregate(physical_pipeline).to_list(1)
+    )
+
+    totals = {
+        "users": users,
+        "banned_users": banned,
+        "files": files,
+        "deleted_files": deleted,
+        "storage_bytes": storage[0]["total"] if storage else 0,
+        "physical_bytes": physical[0]["total"] if physical else 0
+    }
+    await db.stats.update_one(
+        {"_id": TOTALS_ID},
+        {"$set": {**totals, "version": TOTALS_VERSION, "reconciled_at": datetime.utcnow()}},
+        upsert=True
+    )
+    logger.info(f"Reconciled dashboard counters: {totals}")
+    return totals
+
+
+async def _reconcile_loop():
+    while True:
+        await asyncio.sleep(settings.STATS_RECONCILE_INTERVAL)
+        try:
+            # One worker per interval does the recomputation
+            if await try_lock("lock:stats:reconcile", settings.STATS_RECONCILE_INTERVAL - 1):
+                await reconcile_stats()
+        except Exception as e:
+            logger.error(f"Stats reconciliation error: {e}")
+
+
+def start_stats_reconciler():
+    """Start periodic reconciliation of the headline counters"""
+    global _reconcile_task
+    if _reconcile_task or settings.STATS_RECONCILE_INTERVAL <= 0:
+        return
+    _reconcile_task = asyncio.create_task(_reconcile_loop())
+
+
+async def stop_stats_reconciler():
+    """Stop periodic reconciliation"""
+    global _reconcile_task
+    if not _reconcile_task:
+        return
+    _reconcile_task.cancel()
+    try:
+        await _reconcile_task
+    except asyncio.CancelledError:
+        pass
+    _reconcile_task = None
+
 
 async def get_dashboard_stats() -> Dict[str, Any]:
     """Get cached dashboard statistics"""
     cache_key = "stats:dashboard"
-    
+
     # Try cache
     cached = await cache_get(cache_key)
     if cached:
         return orjson.loads(cached)
-    
+
     db = get_database()
     now = datetime.utcnow()
-    day_ago = now - timedelta(days=1)
-    
-    # Total users
-    total_users = await db.users.count_documents({})
-    
-    # Active users (24h)
-    active_24h = await db.users.count_documents({
-        "last_seen_at": {"$gte": day_ago}
-    })
-    
-    # New users (24h)
-    new_24h = await db.users.count_documents({
-        "created_at": {"$gte": day_ago}
-    })
-    
-    # Banned users
-    banned = await db.users.count_documents({"is_banned": True})
-    
-    # Total files
-    total_files = await db.files.count_documents({"deleted_at": None})
-    
-    # Files created (24h)
-    files_24h = await db.files.count_documents({
-        "created_at": {"$gte": day_ago},
-        "deleted_at": None
-    })
-    
-    # Deleted files
-    deleted_files = await db.files.count_documents({"deleted_at": {"$ne": None}})
-    
-    # Storage used
-    storage_pipeline = [
-        {"$match": {"deleted_at": None}},
-        {"$group": {"_id": None, "total": {"$sum": "$size_bytes"}}}
-    ]
-    storage_result = await db.files.aggregate(storage_pipeline).to_list(1)
-    storage_bytes = storage_result[0]["total"] if storage_result else 0
-    
-    # Top 10 files
-    top_files = await db.files.find(
-        {"deleted_at": None}
-    ).sort("downloads", -1).limit(10).to_list(10)
-    
+    window_start = _hour(now) - timedelta(hours=WINDOW_HOURS - 1)
+
+    # Counters only become authoritative once seeded by a reconciliation
+    totals = await db.stats.find_one({"_id": TOTALS_ID})
+    if not totals or totals.get("version") != TOTALS_VERSION:
+        totals = await reconcile_stats()
+
+    # Time-windowed figures from hourly buckets
+    buckets = await db.stats.find({"at": {"$gte": window_start}}).to_list(WINDOW_HOURS + 1)
+    new_24h = sum(b.get("new_users", 0) for b in buckets)
+    files_24h = sum(b.get("files_created", 0) for b in buckets)
+
+    active_24h = await _count_active_24h(now)
+
+    top_files = await get_top_files_detail("all", 10)
+    top_files_24h = await get_top_files_detail("24h", 10)
+
+    storage_bytes = totals["storage_bytes"]
+    physical_bytes = totals["physical_bytes"]
+
     stats = {
-        "total_users": total_users,
+        "total_users": totals["users"],
         "active_24h": active_24h,
         "new_24h": new_24h,
-        "banned_users": banned,
-        "total_files": total_files,
+        "banned_users": totals["banned_users"],
+        "total_files": totals["files"],
         "files_24h": files_24h,
-        "deleted_files": deleted_files,
+        "deleted_files": totals["deleted_files"],
         "storage_bytes": storage_bytes,
         "storage_human": humanize_bytes(storage_bytes),
-        "top_files": [
-            {
-                "uuid": f["uuid"],
-                "file_name": f.get("file_name", "Unnamed"),
-                "downloads": f["downloads"]
-            }
-            for f in top_files
-        ]
+        "physical_storage_bytes": physical_bytes,
+        "physical_storage_human": humanize_bytes(physical_bytes),
+        "dedup_saved_bytes": storage_bytes - physical_bytes,
+        "top_files": top_files,
+        "top_files_24h": top_files_24h
     }
-    
+
     # Cache for 60 seconds
     await cache_set(cache_key, orjson.dumps(stats), ttl=60)
-    
+
     return stats
 
 
+async def get_top_files_detail(window: str = "all", limit: int = 10) -> List[Dict[str, Any]]:
+    """Top files with names, from the Redis leaderboard.
+
+    Without Redis, or while the all-time board is being seeded, it falls
+    back to sorting files by their download count.
+    """
+    db = get_database()
+
+    ranking = await get_top_files(window, limit)
+    if ranking:
+        docs = await db.files.find(
+            {"uuid": {"$in": [uuid for uuid, _ in ranking]}},
+            {"uuid": 1, "file_name": 1}
+        ).to_list(len(ranking))
+        names = {d["uuid"]: d.get("file_name") or "Unnamed" for d in docs}
+        return [
+            {"uuid": uuid, "file_name": names.get(uuid, "Unnamed"), "downloads": score}
+            for uuid, score in ranking
+        ]
+
+    if window != "all" or (ranking is not None and cache.redis_client):
+        return []
+
+    top_files = await db.files.find(
+        {"deleted_at": None}
+    ).sort("downloads", -1).limit(limit).to_list(limit)
+    download_counts = await get_download_counts(top_files)
+    return [
+        {
+            "uuid": f["uuid"],
+            "file_name": f.get("file_name", "Unnamed"),
+            "downloads": download_counts[f["uuid"]]
+        }
+        for f in top_files
+    ]
+
+
 def humanize_bytes(bytes_size: int) -> str:
     """Convert bytes to human readable format"""
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
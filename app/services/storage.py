@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Optional
+from pymongo import ReturnDocument
+from app.db.mongo import get_database
+from app.services.stats import record_stats_event
+import logging
+
+logger = logging.getLogger(__name__)
+
+# storage_objects: one document per message in the storage channel
+#   _id: storage_channel_message_id, file_unique_id, size_bytes,
+#   refs: number of live file records pointing at the message
+# A storage message may only be removed from the channel once refs is 0.
+
+
+async def acquire_storage_object(file_unique_id: str) -> Optional[int]:
+    """Take a reference on a live stored copy of the same content.
+
+    Returns its storage_channel_message_id, or None if the content has to
+    be copied to the storage channel.
+    """
+    db = get_database()
+    storage_object = await db.storage_objects.find_one_and_update(
+        {"file_unique_id": file_unique_id, "refs": {"$gt": 0}},
+        {"$inc": {"refs": 1}},
+        projection={"_id": 1}
+    )
+    return storage_object["_id"] if storage_object else None
+
+
+async def add_storage_reference(storage_message_id: int, file_unique_id: str, size_bytes: int):
+    """Count a new live record on a storage message (fresh copy or restore)"""
+    db = get_database()
+    storage_object = await db.storage_objects.find_one_and_update(
+        {"_id": storage_message_id},
+        {
+            "$inc": {"refs": 1},
+            "$setOnInsert": {
+                "file_unique_id": file_unique_id,
+                "size_bytes": size_bytes,
+                "created_at": datetime.utcnow()
+            }
+        },
+        projection={"refs": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    if storage_object["refs"] == 1:
+        await record_stats_event(physical_bytes=size_bytes)
+
+
+async def release_storage_reference(storage_message_id: int, size_bytes: int) -> bool:
+    """Drop a live record's reference on its storage message.
+
+    Returns True when no live record refers to the message any more.
+    """
+    db = get_database()
+    storage_object = await db.storage_objects.find_one_and_update(
+        {"_id": storage_message_id, "refs": {"$gt": 0}},
+        {"$inc": {"refs": -1}},
+        projection={"refs": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    # Records from before deduplication have no storage object and own their copy
+    if not storage_object or storage_object["refs"] == 0:
+        await record_stats_event(physical_bytes=-size_bytes)
+        return True
+    return False
@@ -0,0 +1,287 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.services import cache
+from app.config import settings
+import asyncio
+import time
+import bson
+import logging
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+_MISSING = object()
+
+# Store a loaded value only if no invalidation bumped the key's version
+# since the miss; KEYS = value, version; ARGV = version seen, value, ttl
+_SET_IF_VERSION_SCRIPT = """
+local version = redis.call('GET', KEYS[2]) or '0'
+if version ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+_registry: Dict[str, "TieredCache"] = {}
+_listener_task: Optional[asyncio.Task] = None
+
+
+class LocalLRU:
+    """In-process LRU cache with per-entry TTL"""
+
+    def __init__(self, max_items: int, ttl: float):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Any:
+        """Return cached value or _MISSING"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Store value, evicting the least recently used entry when full"""
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_items:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        """Drop a single entry"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Drop all entries"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TieredCache:
+    """Read-through cache: in-process LRU in front of Redis in front of a loader.
+
+    Values are encoded with BSON for the Redis tier so Mongo documents keep
+    their ObjectId and datetime types. Invalidations are broadcast over Redis
+    pub/sub so every worker drops its local copy, and bump a per-key version
+    in Redis so a load that raced the invalidation is not written back.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        loader: Callable[[str], Awaitable[Any]],
+        local_ttl: Optional[float] = None,
+        redis_ttl: Optional[int] = None,
+        max_items: Optional[int] = None
+    ):
+        self.namespace = namespace
+        self.loader = loader
+        self.redis_ttl = redis_ttl or settings.CACHE_REDIS_TTL
+        self.local = LocalLRU(
+            max_items or settings.CACHE_LOCAL_MAX_ITEMS,
+            local_ttl or settings.CACHE_LOCAL_TTL
+        )
+        self.hits_local = 0
+        self.hits_redis = 0
+        self.misses = 0
+        # Bumped on every invalidation so a load racing with it is not stored
+        self._generation = 0
+        _registry[namespace] = self
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _version_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}:ver"
+
+    async def _redis_read(self, key: str) -> Tuple[Optional[bytes], Optional[bytes]]:
+        """Cached value and the key's invalidation version, in one round trip"""
+        if not cache.redis_client:
+            return None, None
+        try:
+            cached, version = await cache.redis_client.mget(self._redis_key(key), self._version_key(key))
+            return cached, version or b"0"
+        except Exception as e:
+            logger.error(f"Cache get error: {e}")
+            return None, None
+
+    async def _redis_store(self, key: str, value: Any, version: bytes):
+        """Write a loaded value back unless another worker invalidated the key meanwhile"""
+        try:
+            await cache.redis_client.eval(
+                _SET_IF_VERSION_SCRIPT, 2, self._redis_key(key), self._version_key(key),
+                version, bson.encode({"v": value}), self.redis_ttl
+            )
+        except Exception as e:
+            logger.error(f"Cache set error: {e}")
+
+    async def _redis_invalidate(self, keys: List[str]):
+        """Delete values and bump their versions, so in-flight loads are not stored"""
+        if not cache.redis_client:
+            return
+        try:
+            async with cache.redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(*[self._redis_key(key) for key in keys])
+                for key in keys:
+                    pipe.incr(self._version_key(key))
+                    pipe.expire(self._version_key(key), self.redis_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Cache delete error: {e}")
+
+    async def get(self, key: str) -> Any:
+        """Get value through local, Redis and loader tiers"""
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self.hits_local += 1
+            return value
+
+        generation = self._generation
+
+        cached, version = await self._redis_read(key)
+        if cached is not None:
+            self.hits_redis += 1
+            value = bson.decode(cached)["v"]
+            if generation == self._generation:
+                self.local.set(key, value)
+            return value
+
+        self.misses += 1
+        value = await self.loader(key)
+        if value is None:
+            return None
+
+        if generation == self._generation:
+            self.local.set(key, value)
+            if version is not None:
+                await self._redis_store(key, value, version)
+        return value
+
+    async def invalidate(self, key: str):
+        """Drop key locally, in Redis, and on every other worker"""
+        self._drop_local(key)
+        await self._redis_invalidate([key])
+        await publish_invalidation(self.namespace, key)
+
+    async def invalidate_many(self, keys: List[str]):
+        """Drop several keys with one Redis delete and one broadcast"""
+        if not keys:
+            return
+        for key in keys:
+            self._drop_local(key)
+        await self._redis_invalidate(keys)
+        await publish_invalidation(self.namespace, *keys)
+
+    @property
+    def generation(self) -> int:
+        """Invalidation counter, for callers that prime the cache themselves"""
+        return self._generation
+
+    def prime(self, key: str, value: Any, generation: Optional[int] = None):
+        """Store a freshly read value locally unless an invalidation raced it"""
+        if generation is None or generation == self._generation:
+            self.local.set(key, value)
+
+    def _drop_local(self, key: str):
+        self._generation += 1
+        self.local.delete(key)
+
+    def clear_local(self):
+        """Drop every local entry"""
+        self._generation += 1
+        self.local.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters"""
+        return {
+            "hits_local": self.hits_local,
+            "hits_redis": self.hits_redis,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "size": len(self.local)
+        }
+
+
+async def publish_invalidation(namespace: str, *keys: str):
+    """Broadcast an invalidation to all workers"""
+    if not cache.redis_client:
+        return
+    try:
+        await cache.redis_client.publish(INVALIDATION_CHANNEL, f"{namespace}:" + "\n".join(keys))
+    except Exception as e:
+        logger.error(f"Cache invalidation publish error: {e}")
+
+
+def _handle_invalidation(payload: bytes):
+    namespace, _, keys = payload.decode().partition(":")
+    tiered = _registry.get(namespace)
+    if tiered:
+        for key in keys.split("\n"):
+            tiered._drop_local(key)
+
+
+async def _listen_invalidations():
+    """Apply invalidations from other workers, resubscribing on errors"""
+    while True:
+        if not cache.redis_client:
+            # Wait for a reconnect (see cache.schedule_reconnect)
+            await asyncio.sleep(1)
+            continue
+        pubsub = cache.redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything published while we were disconnected is lost
+            for tiered in _registry.values():
+                tiered.clear_local()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _handle_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cache invalidation listener error: {e}")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+def start_invalidation_listener():
+    """Start the pub/sub listener task"""
+    global _listener_task
+    if _listener_task:
+        return
+    _listener_task = asyncio.create_task(_listen_invalidations())
+    logger.info("✅ Cache invalidation listener started")
+
+
+async def stop_invalidation_listener():
+    """Stop the pub/sub listener task"""
+    global _listener_task
+    if not _listener_task:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Counters for every registered cache"""
+    return {namespace: tiered.stats() for namespace, tiered in _registry.items()}
@@ -1,6 +1,10 @@
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from pymongo import ReturnDocument, UpdateOne
 from app.db.mongo import get_database
+from app.config import settings
+from app.services.tiered_cache import TieredCache, LocalLRU
+from app.services.stats import record_stats_event, record_active_user
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,23 +26,27 @@ async def upsert_user(
         "first_name": first_name,
         "last_name": last_name,
         "username": username,
-        "last_seen_at": now
+        "last_seen_at": now,
+        # Messaging us again means they no longer block the bot
+        "bot_blocked": False
+    }
+    on_insert = {
+        "is_banned": False,
+        "created_at": now
     }
     
-    await db.users.update_one(
+    # BEFORE tells us whether this was an insert in the same round trip
+    before = await db.users.find_one_and_update(
         {"user_id": user_id},
-        {
-            "$set": user_doc,
-            "$setOnInsert": {
-                "is_banned": False,
-                "created_at": now
-            }
-        },
-        upsert=True
+        {"$set": user_doc, "$setOnInsert": on_insert},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
     )
     
-    user = await db.users.find_one({"user_id": user_id})
-    return user
+    if before is None:
+        await record_stats_event(users=1, hourly={"new_users": 1})
+        return {**user_doc, **on_insert}
+    return {**before, **user_doc}
 
 
 async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
@@ -53,15 +61,60 @@ async def is_user_banned(user_id: int) -> bool:
     return user.get("is_banned", False) if user else False
 
 
+async def _load_ban_state(key: str) -> bool:
+    return await is_user_banned(int(key))
+
+
+ban_cache = TieredCache("banned", _load_ban_state)
+
+# Profile last written per user; an entry expiring means last_seen_at is due
+_touched = LocalLRU(settings.CACHE_LOCAL_MAX_ITEMS, settings.USER_TOUCH_DEBOUNCE)
+
+
+async def is_user_banned_cached(user_id: int) -> bool:
+    """Check if user is banned through the two-tier cache"""
+    return await ban_cache.get(str(user_id))
+
+
+async def touch_user(
+    user_id: int,
+    first_name: str,
+    last_name: Optional[str],
+    username: Optional[str]
+) -> bool:
+    """Record user activity and return the ban flag.
+
+    The users collection is only written when the profile changed or the
+    last write is older than USER_TOUCH_DEBOUNCE seconds.
+    """
+    key = str(user_id)
+    profile = (first_name, last_name, username)
+
+    if _touched.get(key) == profile:
+        return await is_user_banned_cached(user_id)
+
+    generation = ban_cache.generation
+    user = await upsert_user(user_id, first_name, last_name, username)
+    _touched.set(key, profile)
+    await record_active_user(user_id)
+
+    is_banned = user.get("is_banned", False)
+    ban_cache.prime(key, is_banned, generation)
+    return is_banned
+
+
 async def ban_user(user_id: int, actor_id: int):
     """Ban a user"""
     from app.services.audits import log_audit
     
     db = get_database()
-    await db.users.update_one(
-        {"user_id": user_id},
+    result = await db.users.update_one(
+        {"user_id": user_id, "is_banned": {"$ne": True}},
         {"$set": {"is_banned": True}}
     )
+    await ban_cache.invalidate(str(user_id))
+    if result.modified_count:
+        await record_stats_event(banned_users=1)
     
     await log_audit(actor_id, "USER_BANNED", notes=f"Banned user {user_id}")
     logger.info(f"User {user_id} banned by {actor_id}")
@@ -72,10 +125,88 @@ async def unban_user(user_id: int, actor_id: int):
     from app.services.audits import log_audit
     
     db = get_database()
-    await db.users.update_one(
-        {"user_id": user_id},
+    result = await db.users.update_one(
+        {"user_id": user_id, "is_banned": True},
         {"$set": {"is_banned": False}}
     )
+    await ban_cache.invalidate(str(user_id))
+    if result.modified_count:
+        await record_stats_event(banned_users=-1)
     
     await log_audit(actor_id, "USER_UNBANNED", notes=f"Unbanned user {user_id}")
     logger.info(f"User {user_id} unbanned by {actor_id}")
+
+
+async def add_user_usage(
+    user_id: int,
+    file_count: int,
+    storage_bytes: int,
+    quota_bytes: Optional[int] = None
+) -> bool:
+    """Atomically adjust the user's live file and storage counters.
+
+    With `quota_bytes`, the increment only applies if the new total stays
+    within the quota; returns False when it would not.
+    """
+    db = get_database()
+
+    query: Dict[str, Any] = {"user_id": user_id}
+    if quota_bytes is not None:
+        query["$or"] = [
+            {"storage_bytes": {"$lte": quota_bytes - storage_bytes}},
+            {"storage_bytes": {"$exists": False}}
+        ]
+
+    result = await db.users.update_one(
+        query,
+        {"$inc": {"file_count": file_count, "storage_bytes": storage_bytes}}
+    )
+    return result.matched_count > 0
+
+
+async def get_user_usage(user_id: int) -> Tuple[int, int]:
+    """Get (live file count, storage bytes) from the materialized counters"""
+    db = get_database()
+    user = await db.users.find_one(
+        {"user_id": user_id},
+        {"file_count": 1, "storage_bytes": 1}
+    )
+    if not user:
+        return 0, 0
+    return user.get("file_count", 0), user.get("storage_bytes", 0)
+
+
+async def reconcile_user_counters(batch_size: int = 1000) -> int:
+    """Recompute every user's counters from the files collection; returns users repaired"""
+    db = get_database()
+
+    actual: Dict[int, Tuple[int, int]] = {}
+    pipeline = [
+        {"$match": {"deleted_at": None}},
+        {"$group": {"_id": "$owner_id", "count": {"$sum": 1}, "bytes": {"$sum": "$size_bytes"}}}
+    ]
+    async for row in db.files.aggregate(pipeline):
+        actual[row["_id"]] = (row["count"], row["bytes"])
+
+    repaired = 0
+    ops = []
+    cursor = db.users.find({}, {"user_id": 1, "file_count": 1, "storage_bytes": 1})
+    async for user in cursor:
+        count, size = actual.get(user["user_id"], (0, 0))
+        if user.get("file_count") == count and user.get("storage_bytes") == size:
+            continue
+        ops.append(UpdateOne(
+            {"_id": user["_id"]},
+            {"$set": {"file_count": count, "storage_bytes": size}}
+        ))
+        if len(ops) >= batch_size:
+            await db.users.bulk_write(ops, ordered=False)
+            repaired += len(ops)
+            ops = []
+
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+        repaired += len(ops)
+
+    logger.info(f"Reconciled file counters for {repaired} users")
+    return repaired
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+import binascii
+import struct
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(token: str) -> bytes:
+    return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+
+
+def encode_cursor(created_at: datetime, oid: ObjectId) -> str:
+    """Opaque continuation token for a (created_at, _id) position (27 chars)"""
+    ms = (created_at - _EPOCH) // timedelta(milliseconds=1)
+    return _b64encode(struct.pack(">q", ms) + oid.binary)
+
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    """Decode a (created_at, _id) token, raising ValueError if malformed"""
+    try:
+        raw = _b64decode(token)
+        if len(raw) != 20:
+            raise ValueError("bad cursor length")
+        (ms,) = struct.unpack(">q", raw[:8])
+        return _EPOCH + timedelta(milliseconds=ms), ObjectId(raw[8:])
+    except (binascii.Error, struct.error, InvalidId, OverflowError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def encode_id_cursor(oid: ObjectId) -> str:
+    """Opaque continuation token for an _id position"""
+    return _b64encode(oid.binary)
+
+
+def decode_id_cursor(token: str) -> ObjectId:
+    """Decode an _id token, raising ValueError if malformed"""
+    try:
+        return ObjectId(_b64decode(token))
+    except (binascii.Error, InvalidId, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def keyset_filter(cursor: Optional[str], before: bool = False) -> Dict[str, Any]:
+    """Filter for the page after (or before) a cursor in (created_at, _id) descending order"""
+    if not cursor:
+        return {}
+    created_at, oid = decode_cursor(cursor)
+    op = "$gt" if before else "$lt"
+    return {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "_id": {op: oid}}
+    ]}
@@ -1,46 +1,103 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Literal
+from datetime import datetime
 from app.web.auth import get_current_admin
-from app.db.mongo import get_database
 from app.bot.main import get_bot
+from app.services.broadcast import (
+    create_broadcast,
+    start_broadcast,
+    get_broadcast,
+    list_broadcasts,
+    set_broadcast_status
+)
 from pydantic import BaseModel
+import asyncio
+import orjson
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+STREAM_INTERVAL_SECONDS = 2
+
 
 class BroadcastRequest(BaseModel):
     message: str
     parse_mode: str = "HTML"
 
 
-async def send_broadcast(message: str, parse_mode: str):
-    """Send broadcast to all users"""
-    db = get_database()
-    bot = get_bot()
-    
-    users = await db.users.find({"is_banned": False}).to_list(None)
-    
-    success = 0
-    failed = 0
-    
-    for user in users:
-        try:
-            await bot.send_message(
-                chat_id=user['user_id'],
-                text=message,
-                parse_mode=parse_mode
-            )
-            success += 1
-        except Exception as e:
-            logger.error(f"Broadcast failed for user {user['user_id']}: {e}")
-            failed += 1
-    
-    logger.info(f"Broadcast complete: {success} success, {failed} failed")
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-friendly job with progress and ETA"""
+    job = dict(job)
+    job["job_id"] = str(job.pop("_id"))
+    job["checkpoint"] = str(job["checkpoint"]) if job.get("checkpoint") else None
+    job.pop("lease_owner", None)
+    job.pop("lease_until", None)
+
+    processed = job["sent"] + job["failed"] + job["blocked"]
+    total = job.get("total")
+    mps = job.get("messages_per_second") or 0
+    job["processed"] = processed
+    job["progress"] = round(processed / total, 4) if total else None
+    job["eta_seconds"] = (
+        round(max(total - processed, 0) / mps) if total and mps and job["status"] == "running" else None
+    )
+
+    for key, value in job.items():
+        if isinstance(value, datetime):
+            job[key] = value.isoformat()
+    return job
 
 
 @router.post("/broadcast", dependencies=[Depends(get_current_admin)])
-async def api_broadcast(request: BroadcastRequest, background_tasks: BackgroundTasks):
+async def api_broadcast(request: BroadcastRequest):
     """Send broadcast message"""
-    background_tasks.add_task(send_broadcast, request.message, request.parse_mode)
-    return {"status": "success", "message": "Broadcast started"}
+    job_id = await create_broadcast(request.message, request.parse_mode)
+    start_broadcast(job_id, get_bot())
+    logger.info(f"Broadcast {job_id} started")
+    return {"status": "success", "message": "Broadcast started", "job_id": job_id}
+
+
+@router.get("/broadcast", dependencies=[Depends(get_current_admin)])
+async def api_list_broadcasts(limit: int = Query(20, ge=1, le=100)):
+    """List recent broadcast jobs"""
+    jobs = await list_broadcasts(limit)
+    return {"jobs": [serialize_job(job) for job in jobs]}
+
+
+@router.get("/broadcast/{job_id}", dependencies=[Depends(get_current_admin)])
+async def api_get_broadcast(job_id: str):
+    """Get broadcast job progress"""
+    job = await get_broadcast(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return serialize_job(job)
+
+
+@router.get("/broadcast/{job_id}/stream", dependencies=[Depends(get_current_admin)])
+async def api_stream_broadcast(job_id: str):
+    """Stream broadcast job progress as server-sent events until it finishes"""
+    if not await get_broadcast(job_id):
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+
+    async def events():
+        while True:
+            job = await get_broadcast(job_id)
+            if not job:
+                return
+            yield b"data: " + orjson.dumps(serialize_job(job)) + b"\n\n"
+            if job["status"] in ("completed", "cancelled"):
+                return
+            await asyncio.sleep(STREAM_INTERVAL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.patch("/broadcast/{job_id}/{action}", dependencies=[Depends(get_current_admin)])
+async def api_update_broadcast(job_id: str, action: Literal["pause", "resume", "cancel"]):
+    """Pause, resume or cancel a broadcast job"""
+    job = await set_broadcast_status(job_id, action, get_bot())
+    if not job:
+        raise HTTPException(status_code=409, detail=f"Cannot {action} this broadcast")
+    return serialize_job(job)
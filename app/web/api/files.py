@@ -1,21 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
 from app.web.auth import get_current_admin
 from app.db.mongo import get_database
 from app.services.files import soft_delete_file, restore_file
+from app.utils.pagination import keyset_filter, encode_cursor
 
 router = APIRouter()
 
 
 @router.get("/files", dependencies=[Depends(get_current_admin)])
-async def api_get_files(skip: int = 0, limit: int = 50):
-    """Get files list"""
+async def api_get_files(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200)):
+    """Get files list, newest first, paginated by continuation token"""
     db = get_database()
-    files = await db.files.find().skip(skip).limit(limit).to_list(limit)
+    
+    try:
+        query = keyset_filter(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    files = await db.files.find(query).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit).to_list(limit)
+    
+    next_cursor = None
+    if len(files) == limit:
+        next_cursor = encode_cursor(files[-1]['created_at'], files[-1]['_id'])
     
     for file in files:
         file['_id'] = str(file['_id'])
     
-    return {"files": files}
+    return {"files": files, "next_cursor": next_cursor}
 
 
 @router.delete("/files/{uuid}", dependencies=[Depends(get_current_admin)])
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from app.web.auth import get_current_admin
-from app.services.stats import get_dashboard_stats
+from app.services.stats import get_dashboard_stats, get_top_files_detail
+from app.services.tiered_cache import get_cache_stats
+from app.services.audits import get_audit_stats
+from app.services.rate_limit import get_rate_limit_stats
+from app.bot.update_queue import get_update_queue_stats
+from app.bot.update_dedup import get_update_dedup_stats
 
 router = APIRouter()
 
@@ -9,3 +14,36 @@ router = APIRouter()
 async def api_get_stats():
     """Get dashboard statistics"""
     return await get_dashboard_stats()
+
+
+@router.get("/stats/top", dependencies=[Depends(get_current_admin)])
+async def api_get_top_files(window: str = "all", limit: int = Query(10, ge=1, le=100)):
+    """Get top files for the all-time, 24h or 7d window"""
+    try:
+        return {"window": window, "files": await get_top_files_detail(window, limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/stats/cache", dependencies=[Depends(get_current_admin)])
+async def api_get_cache_stats():
+    """Get metadata cache counters"""
+    return get_cache_stats()
+
+
+@router.get("/stats/audits", dependencies=[Depends(get_current_admin)])
+async def api_get_audit_stats():
+    """Get audit pipeline counters"""
+    return get_audit_stats()
+
+
+@router.get("/stats/rate-limit", dependencies=[Depends(get_current_admin)])
+async def api_get_rate_limit_stats():
+    """Get rate limiter decision counters"""
+    return get_rate_limit_stats()
+
+
+@router.get("/stats/updates", dependencies=[Depends(get_current_admin)])
+async def api_get_update_queue_stats():
+    """Get webhook update queue depth, wait times and dropped duplicates"""
+    return {**get_update_queue_stats(), **get_update_dedup_stats()}
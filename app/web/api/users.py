@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
 from app.web.auth import get_current_admin
 from app.db.mongo import get_database
 from app.services.users import ban_user, unban_user
+from app.utils.pagination import encode_id_cursor, decode_id_cursor
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -14,16 +15,26 @@ class BanUserRequest(BaseModel):
 
 
 @router.get("/users", dependencies=[Depends(get_current_admin)])
-async def api_get_users(skip: int = 0, limit: int = 50):
-    """Get users list"""
+async def api_get_users(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200)):
+    """Get users list, paginated by continuation token"""
     db = get_database()
-    users = await db.users.find().skip(skip).limit(limit).to_list(limit)
+    
+    query = {}
+    if cursor:
+        try:
+            query = {"_id": {"$gt": decode_id_cursor(cursor)}}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    users = await db.users.find(query).sort("_id", 1).limit(limit).to_list(limit)
+    
+    next_cursor = encode_id_cursor(users[-1]['_id']) if len(users) == limit else None
     
     # Convert ObjectId to string
     for user in users:
         user['_id'] = str(user['_id'])
     
-    return {"users": users}
+    return {"users": users, "next_cursor": next_cursor}
 
 
 @router.patch("/users/{user_id}/ban", dependencies=[Depends(get_current_admin)])
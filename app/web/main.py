@@ -8,11 +8,22 @@ from datetime import timedelta
 from pathlib import Path
 
 from app.config import settings
-from app.db.mongo import connect_db, close_db
+from app.db.mongo import connect_db, close_db, create_indexes, index_specs, index_spec_version
 from app.services.cache import init_redis, close_redis
+from app.services.tiered_cache import start_invalidation_listener, stop_invalidation_listener
+from app.services.downloads import start_download_flusher, stop_download_flusher
+from app.services.audits import start_audit_writer, stop_audit_writer
+from app.services.stats import start_stats_reconciler, stop_stats_reconciler
+from app.services.broadcast import start_broadcast_supervisor, stop_broadcasts
+from app.services.qr import shutdown_qr_executor
+from app.services.startup import run_once
 from app.web.api import stats, users, files, settings as settings_api, broadcast
 from app.web.auth import verify_admin_credentials, create_access_token, get_current_admin
-from app.bot.main import setup_bot, get_bot_dispatcher, get_bot
+from app.bot.main import setup_bot, set_bot_webhook, webhook_spec_version, get_bot_dispatcher, get_bot
+from app.bot.update_queue import start_update_workers, stop_update_workers, update_workers_running, enqueue_update
+from app.bot.webhook import SECRET_HEADER, verify_secret_token, decode_update
+from app.bot.update_dedup import claim_update, release_update
+from app.bot.handlers.upload import flush_media_groups
 
 # Set uvloop as event loop
 uvloop.install()
@@ -31,13 +42,31 @@ async def lifespan(app: FastAPI):
     logger.info("🚀 Starting application...")
     await connect_db()
     await init_redis()
+    # With several workers only one builds indexes and sets the webhook
+    await run_once(f"indexes:{index_spec_version(index_specs())[:12]}", create_indexes)
+    start_audit_writer()
+    start_invalidation_listener()
+    start_download_flusher()
+    start_stats_reconciler()
     await setup_bot()
+    await run_once(f"webhook:{webhook_spec_version()[:12]}", set_bot_webhook)
+    if settings.WEBHOOK_ASYNC:
+        start_update_workers(get_bot_dispatcher(), get_bot())
+    start_broadcast_supervisor(get_bot())
     logger.info("✅ Application started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
+    await stop_update_workers()
+    await flush_media_groups()
+    await stop_broadcasts()
+    await stop_stats_reconciler()
+    await stop_download_flusher()
+    await stop_invalidation_listener()
+    await stop_audit_writer()
+    shutdown_qr_executor()
     await close_redis()
     await close_db()
 
@@ -173,17 +202,29 @@ app.include_router(broadcast.router, prefix="/api", tags=["broadcast"])
 
 
 # Webhook endpoint
-from aiogram.types import Update
-
 @app.post("/webhook")
 async def webhook(request: Request):
     """Telegram webhook endpoint"""
+    # Checked before the body is read or parsed
+    if not verify_secret_token(request.headers.get(SECRET_HEADER)):
+        return ORJSONResponse({"ok": False, "error": "forbidden"}, status_code=403)
+    
     dp = get_bot_dispatcher()
     bot = get_bot()
     
     try:
-        update_data = await request.json()
-        update = Update(**update_data)
+        update = decode_update(await request.body(), bot)
+        
+        # Telegram redelivers updates we answered slowly or with an error
+        if not await claim_update(update.update_id):
+            return {"ok": True}
+        
+        if update_workers_running():
+            # Acknowledge now; a worker runs the handlers. 503 makes Telegram redeliver later
+            if not await enqueue_update(update):
+                await release_update(update.update_id)
+                return ORJSONResponse({"ok": False, "error": "overloaded"}, status_code=503)
+            return {"ok": True}
         await dp.feed_update(bot, update)
         return {"ok": True}
     except Exception as e:
@@ -0,0 +1,279 @@
+"""Local stand-in for the Telegram Bot API, for load tests without flood limits.
+
+Implements the methods the upload, deep-link and broadcast flows use
+(copyMessage, copyMessages, sendMessage, sendPhoto, deleteMessage,
+setWebhook, getWebhookInfo and a few trivial ones) with configurable
+latency, injected server errors and RetryAfter (429) responses. Updates
+added with push_update are served by getUpdates, for the polling runner. Point the bot at it with
+TELEGRAM_API_URL=http://127.0.0.1:8081 in .env, then:
+
+    python -m benchmarks.mock_telegram --mock-port 8081 --latency-ms 80 --retry-after-rate 0.01
+
+benchmarks.webhook_load runs the same server in-process.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+import orjson
+from aiohttp import web
+
+# Called after every successful API call with (method, params, result)
+Listener = Callable[[str, Dict[str, Any], Any], None]
+
+# Setup calls are never delayed or failed, so the app always starts
+RELIABLE_METHODS = {"getMe", "setWebhook", "deleteWebhook", "getWebhookInfo"}
+
+
+def _parse_value(key: str, value: Any) -> Any:
+    """Form fields arrive as strings; aiogram JSON-encodes lists and objects"""
+    if not isinstance(value, str):
+        return value  # uploaded file
+    if value[:1] in ("[", "{"):
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return value
+    if key.endswith("_id") and value.lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+class MockTelegram:
+    """In-memory Bot API with fault injection"""
+
+    def __init__(
+        self,
+        latency_ms: float = 50,
+        jitter_ms: float = 20,
+        error_rate: float = 0.0,
+        retry_after_rate: float = 0.0,
+        retry_after: int = 1,
+        method_latency_ms: Optional[Dict[str, float]] = None,
+        bot_username: str = "mock_bot"
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.method_latency_ms = method_latency_ms or {}
+        self.bot_username = bot_username
+
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.retry_afters: Counter = Counter()
+        self.listeners: List[Listener] = []
+        self._ids = itertools.count(1000)
+        self.webhook_url = ""
+        self._updates: List[Dict[str, Any]] = []
+        self._update_added = asyncio.Event()
+
+        self.methods: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "getMe": self.get_me,
+            "setWebhook": self.set_webhook,
+            "deleteWebhook": self.delete_webhook,
+            "getWebhookInfo": self.get_webhook_info,
+            "getUpdates": self.get_updates,
+            "deleteMessage": self.ok,
+            "deleteMessages": self.ok,
+            "answerCallbackQuery": self.ok,
+            "sendMessage": self.send_message,
+            "editMessageText": self.send_message,
+            "sendPhoto": self.send_photo,
+            "copyMessage": self.copy_message,
+            "copyMessages": self.copy_messages
+        }
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    def _message(self, chat_id: int, **fields: Any) -> Dict[str, Any]:
+        return {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "channel"},
+            **fields
+        }
+
+    # API methods
+
+    def ok(self, params: Dict[str, Any]) -> bool:
+        return True
+
+    def get_me(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": 1, "is_bot": True, "first_name": "Mock", "username": self.bot_username}
+
+    def set_webhook(self, params: Dict[str, Any]) -> bool:
+        self.webhook_url = params.get("url", "")
+        return True
+
+    def delete_webhook(self, params: Dict[str, Any]) -> bool:
+        self.webhook_url = ""
+        return True
+
+    def get_webhook_info(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": 0}
+
+    def push_update(self, update: Dict[str, Any]):
+        """Queue an update for getUpdates (update_ids must increase)"""
+        self._updates.append(update)
+        self._update_added.set()
+
+    async def get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Updates from `offset` on, long-polling up to `timeout` seconds for one.
+
+        Like Telegram, an offset confirms (drops) every earlier update.
+        """
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + int(params.get("timeout") or 0)
+        while True:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            remaining = deadline - loop.time()
+            if self._updates or remaining <= 0:
+                return self._updates[:limit]
+            self._update_added.clear()
+            try:
+                await asyncio.wait_for(self._update_added.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def send_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return self._message(params["chat_id"], text=params.get("text", ""))
+
+    def send_photo(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        photo = params.get("photo")
+        # A file_id being reused is echoed; uploads (attach://<part>) get a new one
+        if isinstance(photo, str) and not photo.startswith("attach://"):
+            file_id = photo
+        else:
+            file_id = f"mock-photo-{next(self._ids)}"
+        return self._message(params["chat_id"], photo=[{
+            "file_id": file_id, "file_unique_id": file_id[-16:], "width": 512, "height": 512
+        }])
+
+    def copy_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"message_id": next(self._ids)}
+
+    def copy_messages(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [{"message_id": next(self._ids)} for _ in params.get("message_ids", [])]
+
+    # HTTP
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        form = await request.post()
+        params = {key: _parse_value(key, value) for key, value in form.items()}
+        self.calls[method] += 1
+
+        handler = self.methods.get(method)
+        if not handler:
+            return self._error(404, f"Not Found: method {method} is not mocked")
+
+        if method not in RELIABLE_METHODS:
+            latency = self.method_latency_ms.get(method, self.latency_ms)
+            await asyncio.sleep(max(0.0, latency + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+            roll = random.random()
+            if roll < self.retry_after_rate:
+                self.retry_afters[method] += 1
+                return self._error(
+                    429, f"Too Many Requests: retry after {self.retry_after}",
+                    {"retry_after": self.retry_after}
+                )
+            if roll < self.retry_after_rate + self.error_rate:
+                self.errors[method] += 1
+                return self._error(500, "Internal Server Error: injected")
+
+        result = handler(params)
+        if asyncio.iscoroutine(result):
+            result = await result
+        for listener in self.listeners:
+            listener(method, params, result)
+        return web.Response(body=orjson.dumps({"ok": True, "result": result}), content_type="application/json")
+
+    def _error(self, code: int, description: str, parameters: Optional[Dict[str, Any]] = None) -> web.Response:
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return web.Response(status=code, body=orjson.dumps(body), content_type="application/json")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": dict(self.calls),
+            "errors": dict(self.errors),
+            "retry_afters": dict(self.retry_afters)
+        }
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.Response(body=orjson.dumps(self.stats()), content_type="application/json")
+
+
+async def start_mock(mock: MockTelegram, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(mock.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--mock-host", default="127.0.0.1")
+    parser.add_argument("--mock-port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with HTTP 500")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="share of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after seconds in 429 answers")
+    parser.add_argument(
+        "--method-latency", default="",
+        help="per-method latency overrides, e.g. sendPhoto=250,copyMessage=120"
+    )
+    parser.add_argument("--bot-username", default="mock_bot")
+
+
+def mock_from_args(args: argparse.Namespace) -> MockTelegram:
+    method_latency = {}
+    for item in filter(None, args.method_latency.split(",")):
+        method, ms = item.split("=")
+        method_latency[method.strip()] = float(ms)
+    return MockTelegram(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=args.retry_after,
+        method_latency_ms=method_latency,
+        bot_username=args.bot_username
+    )
+
+
+async def _serve(args: argparse.Namespace):
+    mock = mock_from_args(args)
+    runner = await start_mock(mock, args.mock_host, args.mock_port)
+    print(f"Mock Bot API on http://{args.mock_host}:{args.mock_port} (stats at /stats)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(orjson.dumps(mock.stats()).decode())
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_mock_arguments(parser)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
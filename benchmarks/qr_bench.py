@@ -0,0 +1,72 @@
+"""Benchmark QR rendering on the event loop versus in the worker pool.
+
+Reports render throughput and event-loop lag (how late a 10ms ticker
+wakes up) while N uploads request QR codes concurrently. Redis caching
+is bypassed so every request renders.
+
+    python -m benchmarks.qr_bench --requests 200 --executor thread --workers 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from uuid import uuid4
+from app.config import settings
+from app.services import cache, qr
+
+TICK = 0.01
+
+
+async def measure_lag(samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        samples.append(time.perf_counter() - start - TICK)
+
+
+async def legacy_generate(uuid: str) -> bytes:
+    """Previous behaviour: render synchronously inside the coroutine"""
+    return qr.render_qr_png(f"https://t.me/{settings.BOT_USERNAME}?start={uuid}")
+
+
+async def run(name: str, func, requests: int):
+    lag, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(lag, stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[func(str(uuid4())) for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    lag_ms = sorted(x * 1000 for x in lag) or [0.0]
+    p99 = lag_ms[min(len(lag_ms) - 1, int(len(lag_ms) * 0.99))]
+    print(
+        f"{name:<10} {requests / elapsed:>8.1f} renders/s  "
+        f"loop lag p50={statistics.median(lag_ms):.1f}ms p99={p99:.1f}ms max={lag_ms[-1]:.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    settings.QR_RENDER_EXECUTOR = args.executor
+    settings.QR_RENDER_WORKERS = args.workers
+    cache.redis_client = None
+
+    # Warm the pool so worker start-up is not measured
+    await asyncio.gather(*[qr.get_qr_png(str(uuid4())) for _ in range(args.workers * 2)])
+
+    print(f"{args.requests} concurrent QR requests")
+    await run("inline", legacy_generate, args.requests)
+    await run(f"{args.executor}x{args.workers}", qr.get_qr_png, args.requests)
+
+    qr.shutdown_qr_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Benchmark the direct 1-bit QR renderer against the previous LANCZOS path.
+
+Also checks that both images decode to the same module matrix by sampling
+the centre of every module.
+
+    python -m benchmarks.qr_render_bench --iterations 300
+"""
+import argparse
+import time
+from io import BytesIO
+from uuid import uuid4
+import qrcode
+from PIL import Image
+from app.config import settings
+from app.services.qr import render_qr_png, QR_IMAGE_SIZE
+
+
+def legacy_render_qr_png(deep_link: str) -> bytes:
+    """Previous generate_qr_code body: box_size=10 then LANCZOS to 512x512"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=2
+    )
+    qr.add_data(deep_link)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    img = img.resize((512, 512), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def sample_modules(png: bytes, modules: int, box_size: float, offset: float):
+    """Read the module matrix back by sampling each module's centre pixel"""
+    img = Image.open(BytesIO(png)).convert("L")
+    return [
+        [
+            img.getpixel((int(offset + (x + 0.5) * box_size), int(offset + (y + 0.5) * box_size))) < 128
+            for x in range(modules)
+        ]
+        for y in range(modules)
+    ]
+
+
+def bench(func, links):
+    start = time.perf_counter()
+    sizes = [len(func(link)) for link in links]
+    elapsed = time.perf_counter() - start
+    return elapsed / len(links) * 1000, sum(sizes) / len(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    links = [f"https://t.me/{settings.BOT_USERNAME}?start={uuid4()}" for _ in range(args.iterations)]
+
+    legacy_ms, legacy_bytes = bench(legacy_render_qr_png, links)
+    direct_ms, direct_bytes = bench(render_qr_png, links)
+
+    print(f"{'renderer':<8} {'ms/render':>10} {'avg PNG bytes':>14}")
+    print(f"{'legacy':<8} {legacy_ms:>10.2f} {legacy_bytes:>14.0f}")
+    print(f"{'direct':<8} {direct_ms:>10.2f} {direct_bytes:>14.0f}")
+
+    mismatches = 0
+    for link in links[:20]:
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, border=2)
+        qr.add_data(link)
+        qr.make(fit=True)
+        matrix = qr.get_matrix()
+        modules = len(matrix)
+        box_size = QR_IMAGE_SIZE // modules
+        offset = (QR_IMAGE_SIZE - modules * box_size) / 2
+        direct = sample_modules(render_qr_png(link), modules, box_size, int(offset))
+        legacy = sample_modules(legacy_render_qr_png(link), modules, QR_IMAGE_SIZE / modules, 0)
+        mismatches += (direct != matrix) + (legacy != matrix)
+    print("module matrices identical" if not mismatches else f"{mismatches} matrix mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark the GCRA rate limiter against the previous sorted-set limiter.
+
+Needs a reachable Redis and the usual .env (for app.config):
+
+    python -m benchmarks.rate_limit_bench --requests 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+import redis.asyncio as redis
+from app.config import settings
+from app.services import cache
+from app.services.rate_limit import acquire
+
+
+async def legacy_acquire(client: redis.Redis, key: str, limit: int, period: int) -> bool:
+    """Previous check_rate_limit: four round trips, not atomic"""
+    now = int(time.time())
+    await client.zremrangebyscore(key, 0, now - period)
+    count = await client.zcard(key)
+    if count >= limit:
+        return False
+    await client.zadd(key, {f"{now}:{count}:{time.perf_counter_ns()}": now})
+    await client.expire(key, period)
+    return True
+
+
+async def run(name, func, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    admitted = 0
+
+    async def one():
+        nonlocal admitted
+        async with semaphore:
+            if await func():
+                admitted += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+    print(f"{name:<8} {requests / elapsed:>10.0f} checks/s  admitted={admitted}")
+    return admitted
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=1000, help="admissions allowed per hour")
+    args = parser.parse_args()
+
+    client = redis.from_url(settings.REDIS_URL, decode_responses=False)
+    await client.ping()
+    cache.redis_client = client
+    await client.delete("bench:legacy", "bench:gcra")
+
+    print(f"{args.requests} checks, concurrency {args.concurrency}, limit {args.limit}/hour")
+    await run("legacy", lambda: legacy_acquire(client, "bench:legacy", args.limit, 3600), args.requests, args.concurrency)
+    await run("gcra", lambda: _gcra(args.limit), args.requests, args.concurrency)
+    print(f"admitted above {args.limit} means the limiter over-admitted under concurrency")
+
+    await client.delete("bench:legacy", "bench:gcra")
+    await client.close()
+
+
+async def _gcra(limit: int) -> bool:
+    allowed, _ = await acquire("bench:gcra", limit, 3600)
+    return allowed
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""Measure cold start of N worker processes with and without the startup
+coordinator.
+
+"legacy" is the previous lifespan: every worker builds all indexes and calls
+set_webhook. "coordinated" goes through run_once, so one worker does the
+work and a restart with unchanged index specs skips it entirely.
+set_webhook is simulated by a sleep of --rtt-ms; Mongo and Redis are real.
+Needs the usual .env (for app.config):
+
+    python -m benchmarks.startup_bench --workers 8 --rtt-ms 300
+"""
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+from app.db.mongo import connect_db, close_db, create_indexes, index_specs, index_spec_version, db, INDEX_SPEC_ID
+from app.services import cache
+from app.services.cache import init_redis, close_redis
+from app.services.startup import run_once
+
+
+async def _start_worker(mode: str, rtt: float, webhook_calls) -> float:
+    started = time.perf_counter()
+    await connect_db()
+    await init_redis()
+
+    async def set_webhook():
+        with webhook_calls.get_lock():
+            webhook_calls.value += 1
+        await asyncio.sleep(rtt)
+
+    if mode == "legacy":
+        await create_indexes(force=True)
+        await set_webhook()
+    else:
+        await run_once(f"indexes:{index_spec_version(index_specs())[:12]}", create_indexes)
+        await run_once("bench-webhook", set_webhook)
+
+    ready = time.perf_counter() - started
+    await close_redis()
+    await close_db()
+    return ready
+
+
+def _worker(mode: str, rtt: float, webhook_calls, start_at: float, results):
+    while time.time() < start_at:
+        time.sleep(0.001)
+    results.put(asyncio.run(_start_worker(mode, rtt, webhook_calls)))
+
+
+async def _reset(fresh_indexes: bool):
+    await connect_db()
+    await init_redis()
+    if cache.redis_client:
+        keys = [key async for key in cache.redis_client.scan_iter("startup:*")]
+        if keys:
+            await cache.redis_client.delete(*keys)
+    if fresh_indexes:
+        await db.db.meta.delete_one({"_id": INDEX_SPEC_ID})
+    await close_redis()
+    await close_db()
+
+
+def run(mode: str, workers: int, rtt: float, fresh_indexes: bool):
+    asyncio.run(_reset(fresh_indexes))
+    ctx = multiprocessing.get_context("spawn")
+    webhook_calls = ctx.Value("i", 0)
+    results = ctx.Queue()
+    start_at = time.time() + 2.0  # let every process finish importing first
+    procs = [
+        ctx.Process(target=_worker, args=(mode, rtt, webhook_calls, start_at, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    ready = sorted(results.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+
+    label = f"{mode} ({'first deploy' if fresh_indexes else 'restart'})"
+    print(
+        f"{label:28} all ready {ready[-1] * 1000:8.1f}ms  "
+        f"median {statistics.median(ready) * 1000:8.1f}ms  "
+        f"set_webhook calls {webhook_calls.value}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rtt-ms", type=float, default=300)
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    run("legacy", args.workers, rtt, fresh_indexes=True)
+    run("coordinated", args.workers, rtt, fresh_indexes=True)
+    run("coordinated", args.workers, rtt, fresh_indexes=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Measure upload-to-link latency of the pipelined upload handler against the
+previous serial flow.
+
+Telegram is simulated by a Bot whose API calls sleep for a configurable
+round trip; Mongo and Redis are real. Needs the usual .env (for app.config):
+
+    python -m benchmarks.upload_bench --uploads 200 --rtt-ms 80
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime
+from aiogram import Bot
+from aiogram.methods import CopyMessage, SendPhoto
+from aiogram.types import Chat, Document, InlineKeyboardMarkup, InlineKeyboardButton, Message, MessageId, PhotoSize, User
+from app.bot.handlers.upload import handle_file_upload
+from app.config import settings
+from app.db.mongo import connect_db, close_db
+from app.services.audits import start_audit_writer, stop_audit_writer
+from app.services.cache import init_redis, close_redis
+from app.services.files import create_file_record
+from app.services.qr import generate_qr_code, shutdown_qr_executor
+from app.services.users import upsert_user
+
+
+class SimulatedBot(Bot):
+    """Answers every API call after a jittered round trip"""
+
+    def __init__(self, rtt: float):
+        super().__init__(token="42:simulated")
+        self.rtt = rtt
+        self.link_sent_at = {}
+        self._message_id = 0
+
+    def _message(self, chat_id: int, **fields) -> Message:
+        self._message_id += 1
+        return Message(
+            message_id=self._message_id,
+            date=datetime.utcnow(),
+            chat=Chat(id=chat_id, type="private"),
+            **fields
+        ).as_(self)
+
+    async def __call__(self, method, request_timeout=None):
+        await asyncio.sleep(self.rtt * random.uniform(0.8, 1.2))
+        if isinstance(method, CopyMessage):
+            self._message_id += 1
+            return MessageId(message_id=self._message_id)
+        if isinstance(method, SendPhoto):
+            photo = PhotoSize(file_id=f"qr-{self._message_id}", file_unique_id="qr", width=512, height=512)
+            return self._message(method.chat_id, photo=[photo])
+        text = getattr(method, "text", None)
+        if text is None:
+            return True
+        if "Stored!" in text:
+            self.link_sent_at[method.chat_id] = time.perf_counter()
+        return self._message(method.chat_id, text=text)
+
+
+async def legacy_upload(message: Message, bot: Bot):
+    """Previous handle_file_upload body: every step in sequence, QR first"""
+    file_obj = message.document
+    status_msg = await message.answer("⏳ Processing your file...")
+    copied = await bot.copy_message(
+        chat_id=settings.STORAGE_CHANNEL_ID,
+        from_chat_id=message.chat.id,
+        message_id=message.message_id
+    )
+    file_doc = await create_file_record(
+        owner_id=message.from_user.id,
+        file_type="document",
+        storage_message_id=copied.message_id,
+        file_id=file_obj.file_id,
+        file_unique_id=file_obj.file_unique_id,
+        file_name=file_obj.file_name,
+        mime_type=file_obj.mime_type,
+        size_bytes=file_obj.file_size
+    )
+    uuid = file_doc["uuid"]
+    deep_link = f"https://t.me/{settings.BOT_USERNAME}?start={uuid}"
+    await status_msg.delete()
+    await bot.send_photo(
+        chat_id=message.chat.id,
+        photo=await generate_qr_code(uuid),
+        caption="",
+        has_spoiler=True,
+        disable_notification=True
+    )
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔗 Share File", url=deep_link)]
+    ])
+    await message.answer(
+        f"✅ <b>Stored!</b>🔐\n\n<b>Link :</b> {deep_link}",
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+
+
+def upload_message(bot: Bot, chat_id: int) -> Message:
+    return Message(
+        message_id=1,
+        date=datetime.utcnow(),
+        chat=Chat(id=chat_id, type="private"),
+        from_user=User(id=chat_id, is_bot=False, first_name="bench"),
+        document=Document(
+            file_id=f"doc-{chat_id}",
+            file_unique_id=f"u-{chat_id}",
+            file_name="bench.bin",
+            mime_type="application/octet-stream",
+            file_size=1024
+        )
+    ).as_(bot)
+
+
+async def run(name: str, handler, bot: SimulatedBot, uploads: int, concurrency: int, first_chat: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    for i in range(uploads):
+        await upsert_user(first_chat + i, "bench", None, None)
+
+    async def one(chat_id: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(upload_message(bot, chat_id), bot)
+            latencies.append((bot.link_sent_at[chat_id] - start) * 1000)
+
+    await asyncio.gather(*[one(first_chat + i) for i in range(uploads)])
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<10} p50={statistics.median(latencies):>7.1f}ms  p95={p95:>7.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rtt-ms", type=float, default=80, help="simulated Telegram round trip")
+    args = parser.parse_args()
+
+    await connect_db()
+    await init_redis()
+    start_audit_writer()
+    bot = SimulatedBot(args.rtt_ms / 1000)
+
+    print(f"{args.uploads} uploads, concurrency {args.concurrency}, rtt {args.rtt_ms:.0f}ms (upload -> link message)")
+    try:
+        # Disjoint user ids so the two runs do not share QR or quota state
+        await run("serial", legacy_upload, bot, args.uploads, args.concurrency, 9_000_000_000)
+        await run("pipelined", handle_file_upload, bot, args.uploads, args.concurrency, 9_100_000_000)
+    finally:
+        await stop_audit_writer()
+        shutdown_qr_executor()
+        await close_redis()
+        await close_db()
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Benchmark webhook body decoding per update type.
+
+"legacy" is the previous path: stdlib json via request.json(), Update(**data),
+then the re-mount feed_update does for updates not bound to the bot.
+"orjson" is decode_update: orjson.loads plus Update.model_validate with the
+bot in context.
+
+    python -m benchmarks.webhook_decode_bench --iterations 20000
+"""
+import argparse
+import json
+import time
+import orjson
+from aiogram import Bot
+from aiogram.types import Update
+from app.bot.webhook import decode_update
+
+USER = {"id": 123456789, "is_bot": False, "first_name": "Ada", "username": "ada", "language_code": "en"}
+CHAT = {"id": 123456789, "type": "private", "first_name": "Ada", "username": "ada"}
+
+PAYLOADS = {
+    "message": {
+        "update_id": 1,
+        "message": {
+            "message_id": 10, "date": 1700000000, "chat": CHAT, "from": USER,
+            "text": "/start 0b2f7e3c-1234-4abc-9def-0123456789ab",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}]
+        }
+    },
+    "document": {
+        "update_id": 2,
+        "message": {
+            "message_id": 11, "date": 1700000000, "chat": CHAT, "from": USER,
+            "document": {
+                "file_id": "BQACAgIAAxkBAAIBZ2V" + "x" * 60, "file_unique_id": "AgADZ2V",
+                "file_name": "report.pdf", "mime_type": "application/pdf", "file_size": 1048576,
+                "thumbnail": {"file_id": "AAMCAgADGQ" + "y" * 60, "file_unique_id": "AQADx",
+                              "width": 320, "height": 240, "file_size": 9000}
+            },
+            "caption": "Quarterly report"
+        }
+    },
+    "callback_query": {
+        "update_id": 3,
+        "callback_query": {
+            "id": "4382bfdwdsb323b2d9", "from": USER, "chat_instance": "-123456789",
+            "data": "myfiles:page:2:n:AAABjK8XQYBlZx3Qm7cSbiY",
+            "message": {
+                "message_id": 12, "date": 1700000000, "chat": CHAT,
+                "from": {"id": 42, "is_bot": True, "first_name": "FileBot", "username": "filebot"},
+                "text": "📂 My Files (Page 1/3)",
+                "reply_markup": {"inline_keyboard": [
+                    [{"text": f"📄 file {i}.pdf", "callback_data": f"file:view:{i:036d}"}] for i in range(10)
+                ]}
+            }
+        }
+    }
+}
+
+
+def legacy_decode(body: bytes, bot: Bot) -> Update:
+    update = Update(**json.loads(body))
+    # What feed_update did with the unbound Update
+    return Update.model_validate(update.model_dump(), context={"bot": bot})
+
+
+def bench(func, body: bytes, bot: Bot, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(body, bot)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    bot = Bot(token="42:benchmark")
+    print(f"{'update type':<15} {'legacy µs':>10} {'orjson µs':>10} {'speedup':>8}")
+    for name, payload in PAYLOADS.items():
+        body = orjson.dumps(payload)
+        assert decode_update(body, bot) == legacy_decode(body, bot)
+        legacy = bench(legacy_decode, body, bot, args.iterations)
+        fast = bench(decode_update, body, bot, args.iterations)
+        print(f"{name:<15} {legacy:>10.1f} {fast:>10.1f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Post synthetic updates to a running bot's /webhook and measure each flow
+end to end against the mock Bot API.
+
+The mock (benchmarks.mock_telegram) runs in this process; start the app
+separately with TELEGRAM_API_URL pointing at it, e.g.
+
+    TELEGRAM_API_URL=http://127.0.0.1:8081 uvicorn app.web.main:app --port 8080
+    python -m benchmarks.webhook_load --target http://127.0.0.1:8080 --uploads 500 --rate 50 --broadcast
+
+With --polling the updates are queued in the mock's getUpdates instead, for
+TELEGRAM_API_URL=http://127.0.0.1:8081 python -m app.bot.polling (start the
+load test first so the runner finds the mock; broadcast needs the web app).
+
+Flows, each timed from posting the update to the flow's last API call:
+  upload    document message -> QR photo sent back (sendPhoto)
+  deeplink  /start <uuid> of an uploaded file -> file copied to the chat (copyMessage)
+  broadcast admin API broadcast -> each user's sendMessage (time since the job started)
+Uses the same .env as the app (webhook secret, admin email, JWT secret).
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import re
+import secrets
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import aiohttp
+import orjson
+from app.bot.webhook import SECRET_HEADER
+from app.config import settings
+from app.web.auth import create_access_token
+from benchmarks.mock_telegram import add_mock_arguments, mock_from_args, start_mock
+
+# API call that completes each flow
+TERMINAL_METHOD = {
+    "upload": "sendPhoto",
+    "deeplink": "copyMessage"
+}
+
+# Replies that end a flow without success (errors, rate limiting, maintenance)
+FAILURE_PREFIXES = ("❌", "⚠️", "⏳ Please slow down", "⏳ Server is busy")
+
+LINK_RE = re.compile(r"start=([0-9a-f-]{36})")
+
+# Synthetic users live far above real Telegram ids in use today
+USER_ID_BASE = 9_000_000_000
+
+
+class FlowTracker:
+    """Matches API calls seen by the mock to the synthetic update that caused them"""
+
+    def __init__(self):
+        self.pending: Dict[int, Tuple[str, asyncio.Future]] = {}
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.acks: List[float] = []
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.uuids: List[str] = []
+        self.broadcast_marker: Optional[str] = None
+        self.broadcast_started = 0.0
+
+    def on_call(self, method: str, params: Dict[str, Any], result: Any):
+        chat_id = params.get("chat_id")
+        text = params.get("text") or ""
+        if method == "sendMessage":
+            match = LINK_RE.search(text)
+            if match:
+                self.uuids.append(match.group(1))
+            if self.broadcast_marker and text == self.broadcast_marker:
+                self.latencies["broadcast"].append(time.perf_counter() - self.broadcast_started)
+
+        entry = self.pending.get(chat_id)
+        if not entry or entry[1].done():
+            return
+        flow, future = entry
+        if method == "sendMessage" and text.startswith(FAILURE_PREFIXES):
+            future.set_result(text.split("\n")[0][:40])
+        elif method == TERMINAL_METHOD[flow]:
+            future.set_result(None)
+
+
+def _message(update_id: int, user_id: int, **fields: Any) -> Dict[str, Any]:
+    user = {"id": user_id, "is_bot": False, "first_name": "Load", "username": f"load{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id % 1_000_000,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": "Load"},
+            "from": user,
+            **fields
+        }
+    }
+
+
+def upload_update(update_id: int, user_id: int, size: int) -> Dict[str, Any]:
+    return _message(update_id, user_id, document={
+        "file_id": f"mock-doc-{update_id}",
+        "file_unique_id": f"mockdoc{update_id}",  # unique, so dedup never skips the copy
+        "file_name": f"load-{update_id}.bin",
+        "mime_type": "application/octet-stream",
+        "file_size": size
+    })
+
+
+def deeplink_update(update_id: int, user_id: int, uuid: str) -> Dict[str, Any]:
+    return _message(
+        update_id, user_id,
+        text=f"/start {uuid}",
+        entities=[{"type": "bot_command", "offset": 0, "length": 6}]
+    )
+
+
+async def _post_and_wait(
+    session: aiohttp.ClientSession,
+    tracker: FlowTracker,
+    url: str,
+    flow: str,
+    user_id: int,
+    update: Dict[str, Any],
+    timeout: float,
+    push: Optional[Callable[[Dict[str, Any]], None]] = None
+):
+    future = asyncio.get_running_loop().create_future()
+    tracker.pending[user_id] = (flow, future)
+    outcomes = tracker.outcomes[flow]
+    started = time.perf_counter()
+    try:
+        if push:
+            push(update)
+        else:
+            async with session.post(url, data=orjson.dumps(update)) as resp:
+                await resp.read()
+                tracker.acks.append(time.perf_counter() - started)
+                if resp.status != 200:
+                    outcomes[f"http {resp.status}"] += 1
+                    return
+        failure = await asyncio.wait_for(future, timeout)
+        if failure:
+            outcomes[failure] += 1
+        else:
+            outcomes["ok"] += 1
+            tracker.latencies[flow].append(time.perf_counter() - started)
+    except asyncio.TimeoutError:
+        outcomes["timeout"] += 1
+    except aiohttp.ClientError as e:
+        outcomes[type(e).__name__] += 1
+    finally:
+        tracker.pending.pop(user_id, None)
+
+
+async def run_flow(
+    session: aiohttp.ClientSession,
+    tracker: FlowTracker,
+    target: str,
+    flow: str,
+    updates: List[Tuple[int, Dict[str, Any]]],
+    rate: float,
+    timeout: float,
+    push: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> float:
+    """Post (or `push` to getUpdates) updates open-loop at `rate` per second;
+    returns the elapsed time"""
+    url = f"{target}/webhook"
+    started = time.perf_counter()
+    tasks = []
+    for i, (user_id, update) in enumerate(updates):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(_post_and_wait(session, tracker, url, flow, user_id, update, timeout, push)))
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started
+
+
+async def run_broadcast(session: aiohttp.ClientSession, tracker: FlowTracker, target: str, timeout: float) -> float:
+    """Start a broadcast through the admin API and wait for the job to finish"""
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': settings.ADMIN_EMAIL})}"}
+    tracker.broadcast_marker = f"Load test broadcast {secrets.token_hex(4)}"
+    tracker.broadcast_started = time.perf_counter()
+
+    async with session.post(
+        f"{target}/api/broadcast", json={"message": tracker.broadcast_marker}, headers=headers
+    ) as resp:
+        job_id = (await resp.json())["job_id"]
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.5)
+        async with session.get(f"{target}/api/broadcast/{job_id}", headers=headers) as resp:
+            job = await resp.json()
+        if job["status"] != "running":
+            outcomes = tracker.outcomes["broadcast"]
+            outcomes["ok"] += job["sent"]
+            outcomes["failed"] += job["failed"]
+            outcomes["blocked"] += job["blocked"]
+            break
+    else:
+        tracker.outcomes["broadcast"]["timeout"] += 1
+    return time.perf_counter() - tracker.broadcast_started
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def report(flow: str, tracker: FlowTracker, elapsed: float):
+    latencies = sorted(tracker.latencies[flow])
+    outcomes = tracker.outcomes[flow]
+    others = ", ".join(f"{key}: {count}" for key, count in outcomes.most_common() if key != "ok" and count)
+    print(
+        f"{flow:10} ok {outcomes['ok']:6}  {outcomes['ok'] / elapsed:8.1f}/s  "
+        f"p50 {_percentile(latencies, 0.5):8.1f}ms  p95 {_percentile(latencies, 0.95):8.1f}ms  "
+        f"p99 {_percentile(latencies, 0.99):8.1f}ms" + (f"  ({others})" if others else "")
+    )
+
+
+async def run(args: argparse.Namespace):
+    mock = mock_from_args(args)
+    tracker = FlowTracker()
+    mock.listeners.append(tracker.on_call)
+    runner = await start_mock(mock, args.mock_host, args.mock_port)
+    push = mock.push_update if args.polling else None
+
+    update_ids = itertools.count(random.randint(10**8, 10**9))
+    user_ids = itertools.count(USER_ID_BASE + random.randint(0, 10**8))
+    headers = {"Content-Type": "application/json"}
+    if settings.WEBHOOK_SECRET:
+        headers[SECRET_HEADER] = settings.WEBHOOK_SECRET
+
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    try:
+        async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+            uploads = [
+                (user_id, upload_update(next(update_ids), user_id, args.file_size))
+                for user_id in itertools.islice(user_ids, args.uploads)
+            ]
+            elapsed = await run_flow(session, tracker, args.target, "upload", uploads, args.rate, args.timeout, push)
+            report("upload", tracker, elapsed)
+
+            if args.deeplinks and tracker.uuids:
+                deeplinks = [
+                    (user_id, deeplink_update(next(update_ids), user_id, tracker.uuids[i % len(tracker.uuids)]))
+                    for i, user_id in enumerate(itertools.islice(user_ids, args.deeplinks))
+                ]
+                elapsed = await run_flow(
+                    session, tracker, args.target, "deeplink", deeplinks, args.rate, args.timeout, push
+                )
+                report("deeplink", tracker, elapsed)
+            elif args.deeplinks:
+                print("deeplink   skipped: no upload produced a link")
+
+            if args.broadcast and args.polling:
+                print("broadcast  skipped: needs the web app's admin API")
+            elif args.broadcast:
+                elapsed = await run_broadcast(session, tracker, args.target, args.broadcast_timeout)
+                report("broadcast", tracker, elapsed)
+
+        acks = sorted(tracker.acks)
+        if acks:
+            print(
+                f"{'ack':10} p50 {_percentile(acks, 0.5):8.1f}ms  p95 {_percentile(acks, 0.95):8.1f}ms  "
+                f"p99 {_percentile(acks, 0.99):8.1f}ms"
+            )
+        print(f"mock       {orjson.dumps(mock.stats()).decode()}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", default="http://127.0.0.1:8080", help="base URL of the running app")
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--deeplinks", type=int, default=200)
+    parser.add_argument("--broadcast", action="store_true", help="also run an admin broadcast to all users")
+    parser.add_argument("--polling", action="store_true", help="serve updates via the mock's getUpdates, not /webhook")
+    parser.add_argument("--rate", type=float, default=50, help="updates posted per second")
+    parser.add_argument("--file-size", type=int, default=1024 * 1024)
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for each flow to finish")
+    parser.add_argument("--broadcast-timeout", type=float, default=600)
+    parser.add_argument("--connections", type=int, default=100)
+    add_mock_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from app.db.mongo import connect_db, create_indexes, close_db
 
 async def main():
     await connect_db()
-    await create_indexes()
+    await create_indexes(force=True)
     await close_db()
     print("✅ Indexes created successfully")
 
@@ -0,0 +1,15 @@
+"""Script to repair drift in per-user file and storage counters"""
+import asyncio
+from app.db.mongo import connect_db, close_db
+from app.services.users import reconcile_user_counters
+
+
+async def main():
+    await connect_db()
+    repaired = await reconcile_user_counters()
+    await close_db()
+    print(f"✅ Reconciled counters for {repaired} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())